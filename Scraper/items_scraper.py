@@ -256,28 +256,30 @@ class ItemsScraper(BaseScraper):
             tr = recipe_header_tr.find_next_sibling("tr")
             steps = 0
             while tr is not None and steps < 3:
-                anchors = tr.select("a[title]")
-                if not anchors:
+                if not tr.select("a[title]"):
                     break
-                for a in anchors:
-                    t = (a.get("title") or "").strip()
-                    # strip trailing costs e.g. "Recipe (650)" -> "Recipe"
-                    t = re.sub(r"\s*\(\d+(?:\.\d+)?\)\s*$", "", t)
-                    if t:
-                        titles.append(t)  # keep Recipe!
+                for cell in tr.find_all(["td", "th"], recursive=False) or [tr]:
+                    cell_titles = []
+                    for a in cell.select("a[title]"):
+                        t = (a.get("title") or "").strip()
+                        # strip trailing costs e.g. "Recipe (650)" -> "Recipe"
+                        t = re.sub(r"\s*\(\d+(?:\.\d+)?\)\s*$", "", t)
+                        if t:
+                            cell_titles.append(t)  # keep Recipe!
+                    # the icon and the name of a cell link the same item, a component used twice has two cells
+                    titles.extend(dict.fromkeys(cell_titles))
                 consumed_tr_ids.add(id(tr))
                 tr = tr.find_next_sibling("tr")
                 steps += 1
 
-            ordered = list(dict.fromkeys(titles))
-
             builds_from, upgrades_into = [], []
-            if current_title and current_title in ordered:
-                idx = ordered.index(current_title)
-                upgrades_into = ordered[:idx]
-                builds_from = ordered[idx + 1:]
+            if current_title and current_title in titles:
+                idx = titles.index(current_title)
+                upgrades_into = list(dict.fromkeys(titles[:idx]))
+                # the components keep their multiplicity e.g. "Crown + Crown + Recipe"
+                builds_from = [t for t in titles[idx + 1:] if t != current_title]
             else:
-                upgrades_into = ordered
+                upgrades_into = list(dict.fromkeys(titles))
 
             return builds_from, upgrades_into, consumed_tr_ids
 
@@ -1,10 +1,12 @@
 import os
+import json
 import time
 from io import StringIO
 from urllib.parse import urljoin
 from typing import List, Dict
 
 from base_scraper import BaseScraper
+from constants import MECHANICS_TITLES_FILE
 
 from custom_logger.custom_logger import ChatDota2Logger
 
@@ -433,6 +435,9 @@ class MechanicsScraper(BaseScraper):
             if mechanic_text:
                 with open(os.path.join(path, f"{mechanic_title}.md"), 'w') as mechanic_file:
                     mechanic_file.write(mechanic_text)
+        # the titles and their sub titles are used as the entity linking vocabulary
+        with open(os.path.join(path, MECHANICS_TITLES_FILE), 'w') as titles_file:
+            json.dump(self.mechanic_titles, titles_file, indent=4)
 
 
 if __name__ == '__main__':
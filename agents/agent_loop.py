@@ -0,0 +1,179 @@
+import json
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.messages.ai import add_ai_message_chunks
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from agents.rate_limiter import RateLimiter, estimate_request_tokens
+from agents.usage import UsageTracker
+from constants import MAX_AGENT_STEPS
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.executor import run_tool_call
+
+logger = ChatDota2Logger()
+
+STEP_LIMIT_MESSAGE = "I could not gather all the information needed to answer within the allowed number of steps."
+
+
+class ToolCallDispatcher:
+    """
+    Accumulates the tool call chunks of a streamed model response and starts each tool as soon as
+    its call is complete, i.e. its arguments parse as a JSON object or the next call has started,
+    instead of waiting for the end of the response
+    """
+
+    def __init__(self, tool_runner: Callable[[Dict], Awaitable[ToolMessage]] = run_tool_call):
+        self.tool_runner = tool_runner
+        self.calls: Dict[int, Dict] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def add_chunks(self, tool_call_chunks: List[Dict]) -> None:
+        for chunk in tool_call_chunks:
+            index = chunk.get('index') or 0
+            # a new call means that all the previous ones are complete
+            for previous_index in [i for i in self.calls if i < index]:
+                self.dispatch(self.calls[previous_index], complete=True)
+            call = self.calls.setdefault(index, {'name': '', 'args': '', 'id': None})
+            call['name'] += chunk.get('name') or ''
+            call['args'] += chunk.get('args') or ''
+            call['id'] = call['id'] or chunk.get('id')
+            self.dispatch(call)
+
+    def dispatch(self, call: Dict, complete: bool = False) -> None:
+        if not call['id'] or not call['name'] or call['id'] in self.tasks:
+            return
+        # the first chunk of a call carries its name with empty arguments, a call without arguments
+        # is only known to be complete once the next one starts
+        if not call['args'] and not complete:
+            return
+        try:
+            args = json.loads(call['args'] or '{}')
+        except ValueError:
+            # the arguments are still being streamed
+            return
+        if isinstance(args, dict):
+            self.tasks[call['id']] = asyncio.create_task(
+                self.tool_runner({'name': call['name'], 'args': args, 'id': call['id']})
+            )
+
+    async def results(self, tool_calls: List[Dict]) -> List[ToolMessage]:
+        """
+        Waits for the results of the final tool calls of the response, the calls that could not be
+        started early e.g. with arguments repaired by the parser are started now
+        :param tool_calls: the parsed tool calls of the complete response
+        :return: the ToolMessages in the order of the tool calls
+        """
+        for tool_call in tool_calls:
+            if tool_call['id'] not in self.tasks:
+                self.tasks[tool_call['id']] = asyncio.create_task(self.tool_runner(tool_call))
+        return list(await asyncio.gather(*(self.tasks[tool_call['id']] for tool_call in tool_calls)))
+
+    def cancel(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+
+
+async def stream_response(
+    llm_agent: Runnable,
+    inputs: Dict,
+    on_token: Callable[[str], Awaitable[None]],
+    on_tool_call_chunks: Callable[[List[Dict]], None],
+    config: RunnableConfig | None = None,
+) -> Tuple[AIMessageChunk | None, float | None]:
+    """
+    Streams one model response with `astream`, which only yields the message chunks of the model instead
+    of an event for every runnable of the chain like `astream_events` does
+    :param llm_agent: the prompt | model runnable returned by `get_llm_agent`
+    :param inputs: the prompt inputs
+    :param on_token: the coroutine called with every streamed answer token
+    :param on_tool_call_chunks: the function called with the tool call chunks of every streamed chunk
+    :param config: the runnable config e.g. with the Chainlit callbacks
+    :return: the aggregated response with its parsed tool calls and usage, and the time to first token
+    """
+    chunks = []
+    started_at = time.monotonic()
+    time_to_first_token = None
+    async for chunk in llm_agent.astream(inputs, config=config):
+        if time_to_first_token is None:
+            time_to_first_token = time.monotonic() - started_at
+        chunks.append(chunk)
+        if chunk.content:
+            await on_token(chunk.content)
+        if chunk.tool_call_chunks:
+            on_tool_call_chunks(chunk.tool_call_chunks)
+    # the chunks are merged once at the end instead of after every token
+    output = add_ai_message_chunks(chunks[0], *chunks[1:]) if chunks else None
+    return output, time_to_first_token
+
+
+async def run_agent(
+    llm_agent: Runnable,
+    inputs: Dict,
+    on_token: Callable[[str], Awaitable[None]],
+    config: RunnableConfig | None = None,
+    max_steps: int = MAX_AGENT_STEPS,
+    tool_runner: Callable[[Dict], Awaitable[ToolMessage]] = run_tool_call,
+    scratchpad: List[BaseMessage] | None = None,
+    session_id: str = 'default',
+) -> Tuple[str, List, bool]:
+    """
+    Runs the model and its tools in a loop until the model answers without calling any tool. The tool
+    calls are fed back through the `agent_scratchpad` of the prompt, at most `max_steps` model calls are made
+    :param llm_agent: the prompt | model runnable returned by `get_llm_agent`
+    :param inputs: the prompt inputs
+    :param on_token: the coroutine called with every streamed answer token
+    :param config: the runnable config e.g. with the Chainlit callbacks
+    :param max_steps: the maximum number of model calls
+    :param tool_runner: the coroutine running a tool call e.g. through the tool result store of the session
+    :param scratchpad: the tool calls already made and their results e.g. by the hero prefetch
+    :param session_id: the session making the calls, the sessions share the rate limits of the account in turn
+    :return: the answer, the messages of the intermediate steps and whether the run was cut at the step limit
+    """
+    scratchpad = list(scratchpad or [])
+    answer = ''
+    truncated = False
+    for step in range(max_steps):
+        step_inputs = {**inputs, 'agent_scratchpad': scratchpad}
+        # wait for the rate limits of the account instead of hitting them, raises RateLimitExceeded when overloaded
+        estimated_tokens = estimate_request_tokens(llm_agent, step_inputs)
+        await RateLimiter().acquire(session_id, estimated_tokens)
+        dispatcher = ToolCallDispatcher(tool_runner)
+        try:
+            output, time_to_first_token = await stream_response(
+                llm_agent,
+                step_inputs,
+                on_token=on_token,
+                # the last step cannot run tools anymore
+                on_tool_call_chunks=dispatcher.add_chunks if step < max_steps - 1 else lambda chunks: None,
+                config=config
+            )
+        except BaseException:
+            dispatcher.cancel()
+            # the failed call gives its reservation back
+            RateLimiter().settle(estimated_tokens, 0, requests=1)
+            raise
+        if output is not None:
+            UsageTracker().record(output.usage_metadata, time_to_first_token)
+            if output.usage_metadata:
+                RateLimiter().settle(estimated_tokens, output.usage_metadata['input_tokens'] + output.usage_metadata['output_tokens'])
+            if isinstance(output.content, str):
+                answer += output.content
+
+        if output is None or not output.tool_calls:
+            break
+        if step == max_steps - 1:
+            logger.warning("Reached the limit of %s agent steps, dropping the tool calls %s",
+                           max_steps, [tool_call['name'] for tool_call in output.tool_calls])
+            # the text written before the dropped tool calls is not a complete answer
+            truncated = True
+            if not answer:
+                answer = STEP_LIMIT_MESSAGE
+                await on_token(answer)
+            break
+        tool_messages = await dispatcher.results(output.tool_calls)
+        scratchpad += [AIMessage(content=output.content, tool_calls=output.tool_calls), *tool_messages]
+
+    return answer, scratchpad, truncated
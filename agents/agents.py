@@ -1,18 +1,60 @@
-from langchain_core.prompts import ChatPromptTemplate
+from functools import lru_cache
+
+import httpx
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 
-from tools.tools import get_hero
+from constants import LLM_KEEPALIVE_SECONDS, LLM_MAX_CONNECTIONS, LLM_TIMEOUT_SECONDS
+from tools.tools import find_abilities, get_hero, get_hero_stats_at_level, get_item, item_build_tree, rank_heroes, search_mechanics, semantic_search
+
+
+@lru_cache(maxsize=None)
+def get_http_clients():
+    """
+    Creates the keep-alive connection pools shared by all the LLM clients of the worker so that the
+    TLS and connection setup is paid once instead of once per session
+    :return: the sync and async httpx clients
+    """
+    limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                          keepalive_expiry=LLM_KEEPALIVE_SECONDS)
+    timeout = httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0)
+    return httpx.Client(limits=limits, timeout=timeout), httpx.AsyncClient(limits=limits, timeout=timeout)
 
 
+# the agents hold no per session state, one of each is shared by all the sessions of the worker
+@lru_cache(maxsize=None)
 def get_llm_agent(model, temperature):
-    llm = ChatOpenAI(model=model, temperature=temperature, streaming=True)
+    http_client, http_async_client = get_http_clients()
+    # stream_usage reports the token usage, including the cached input tokens, at the end of the stream
+    llm = ChatOpenAI(model=model, temperature=temperature, streaming=True, stream_usage=True,
+                     http_client=http_client, http_async_client=http_async_client)
     prompt_template = ChatPromptTemplate.from_messages(
         [
             ("system",
-             "You are a DOTA 2 expert. You must answer to the user's questions using the available tool `get_hero` to retrieve the information regarding the hero. The order of `abilities` are important in the response of the tool because they are often referred to first, second, third or ultimate(last ability). \n\n Always generate your response in markdown style but don't use the beginning of the markdown characters "),
-            ("human", "User message: {user_message} \n\n Chat History: {chat_history}")
+             "You are a DOTA 2 expert. You must answer to the user's questions using the available tool `get_hero` to retrieve the information regarding the hero and the available tool `get_item` to retrieve the information regarding the items (cost, recipe, active and passive abilities) and the available tool `search_mechanics` to retrieve the passages explaining the game mechanics. When the question does not name a specific hero, item or mechanic (e.g. which heroes can dispel stuns) use the available tool `semantic_search`. For the stats of a hero at a given level always use the available tool `get_hero_stats_at_level` instead of computing them yourself. For the questions comparing or listing heroes by their stats, attributes, attack type or roles use the available tool `rank_heroes` instead of retrieving every hero. For the questions about the abilities of all the heroes having some effects or properties (e.g. magical stuns) use the available tool `find_abilities`. For the build path, components and total cost of an item use the available tool `item_build_tree` instead of adding the costs yourself. The order of `abilities` are important in the response of the tool because they are often referred to first, second, third or ultimate(last ability). \n\n Always generate your response in markdown style but don't use the beginning of the markdown characters "),
+            # the stable prefix (system prompt, tool schemas, prior messages) comes first so that the provider
+            # side prompt caching applies, only the new user message and the current tool calls change
+            MessagesPlaceholder("chat_history"),
+            ("human", "{user_message}"),
+            # the tool calls of the current turn and their results
+            MessagesPlaceholder("agent_scratchpad", optional=True)
+
+        ]
+    )
+    llm_with_tools = llm.bind_tools([find_abilities, get_hero, get_hero_stats_at_level, get_item, item_build_tree, rank_heroes, search_mechanics, semantic_search])
+    return prompt_template | llm_with_tools
+
 
+@lru_cache(maxsize=None)
+def get_summary_agent(model, temperature):
+    http_client, http_async_client = get_http_clients()
+    llm = ChatOpenAI(model=model, temperature=temperature, http_client=http_client, http_async_client=http_async_client)
+    prompt_template = ChatPromptTemplate.from_messages(
+        [
+            ("system",
+             "You summarize a conversation between a user and a DOTA 2 expert assistant. Merge the previous summary and the new dialogue into one short summary keeping the heroes, items, mechanics and facts discussed and the open questions of the user. Answer with the summary only."),
+            ("human", "Previous summary: {summary} \n\n New dialogue: {dialogue}")
         ]
     )
-    llm_with_tools = llm.bind_tools([get_hero])
-    return prompt_template | llm_with_tools
\ No newline at end of file
+    return prompt_template | llm | StrOutputParser()
\ No newline at end of file
@@ -0,0 +1,200 @@
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, FrozenSet, NamedTuple, Tuple
+
+import numpy as np
+
+from constants import ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS
+from agents.router import ABILITY_SELECTORS, INTENT_PHRASES, match_spans
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.hero_db import HeroDB
+from tools.name_resolver import NameResolver, mention_words
+from tools.vector_index import HashingEncoder
+
+logger = ChatDota2Logger()
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s']+")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# the questions referring to the conversation cannot be answered out of their context
+CONTEXT_DEPENDENT_PATTERN = re.compile(
+    r"\b(he|she|him|her|his|hers|it|its|they|them|their|this|that|these|those|above|previous|again|"
+    r"also|else|instead|more|same|then)\b", re.IGNORECASE
+)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalizes a question so that the rewordings of the same question share their form e.g.
+    "What does AM's ultimate do?" -> "what does anti-mage ultimate do"
+    :param question: the user question
+    :return:
+    """
+    question = NameResolver().canonicalize(PUNCTUATION_PATTERN.sub(' ', question), 'heroes')
+    return ' '.join(NameResolver().canonicalize(question, 'items').split())
+
+
+def is_self_contained(question: str) -> bool:
+    return not CONTEXT_DEPENDENT_PATTERN.search(question)
+
+
+def question_entities(question: str) -> FrozenSet[str]:
+    """
+    Finds the heroes, items and abilities named by a question, two questions naming different entities
+    are never the same question however similar they are
+    :param question: the user question
+    :return:
+    """
+    name_resolver = NameResolver()
+    return frozenset(
+        f"{kind}:{name}"
+        for kind in ('heroes', 'items', 'abilities') for name in name_resolver.find_mentions(question, kind)
+    )
+
+
+def question_key(question: str) -> FrozenSet[str]:
+    """
+    Finds what a question asks about beyond its wording: the entities it names, its numbers and its stat and
+    ability words. The embeddings barely tell "Axe armor at level 15" from "Axe armor at level 16" or the
+    armor from the damage, the similar questions only share an answer when their keys are equal
+    :param question: the user question
+    :return:
+    """
+    words = mention_words(question)
+    covered = [False] * len(words)
+    intents = [f"intent:{intent}" for _, intent in match_spans(words, covered, INTENT_PHRASES.get)]
+    selectors = [f"selector:{selector}" for _, selector in match_spans(words, covered, ABILITY_SELECTORS.get)]
+    numbers = [f"number:{float(number):g}" for number in NUMBER_PATTERN.findall(question)]
+    return question_entities(question) | frozenset(intents + selectors + numbers)
+
+
+class CacheEntry(NamedTuple):
+    answer: str
+    key: FrozenSet[str]
+    data_version: int
+    created_at: float
+    slot: int
+
+
+class AnswerCache:
+    """
+    Caches the answers of the self-contained questions, a question hits when its normalized form was
+    already answered or when its embedding is similar enough to an answered question with the same key,
+    see `question_key`. The entries are tied to the hero data version so that a rescrape invalidates them
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        # the cache can be turned off e.g. to load test the model path
+        self.enabled = True
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self.encoder = HashingEncoder()
+        # normalized question -> entry, in least recently used order
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        # one preallocated row per entry so that the semantic lookup is a single matrix product
+        self.vectors = np.zeros((max_size, self.encoder.dim), dtype=np.float32)
+        self.slot_questions: Dict[int, str] = {}
+        self.free_slots = list(range(max_size - 1, -1, -1))
+        self.metrics = {'lookups': 0, 'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'stores': 0}
+        self._cache_lock = Lock()
+        self._initialized = True
+
+    def remove(self, question: str) -> None:
+        entry = self.entries.pop(question)
+        self.vectors[entry.slot] = 0.0
+        del self.slot_questions[entry.slot]
+        self.free_slots.append(entry.slot)
+
+    def is_valid(self, entry: CacheEntry, now: float) -> bool:
+        return entry.data_version == HeroDB().version and now - entry.created_at <= self.ttl
+
+    def get(self, question: str) -> Tuple[str, str] | None:
+        """
+        Looks up the answer of a question
+        :param question: the user question
+        :return: the answer and the kind of hit (exact or semantic), None on a miss
+        """
+        if not self.enabled or not is_self_contained(question):
+            return None
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._cache_lock:
+            self.metrics['lookups'] += 1
+            entry = self.entries.get(normalized)
+            if entry is not None and not self.is_valid(entry, now):
+                self.remove(normalized)
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(normalized)
+                self.metrics['exact_hits'] += 1
+                return entry.answer, 'exact'
+
+        vector = self.encoder.encode([normalized])[0]
+        key = question_key(question)
+        with self._cache_lock:
+            if self.entries:
+                scores = self.vectors @ vector
+                for slot in np.argsort(-scores)[:5]:
+                    if scores[slot] < self.similarity:
+                        break
+                    cached_question = self.slot_questions.get(int(slot))
+                    entry = self.entries.get(cached_question) if cached_question else None
+                    if entry is None or entry.key != key:
+                        continue
+                    if not self.is_valid(entry, now):
+                        self.remove(cached_question)
+                        continue
+                    self.entries.move_to_end(cached_question)
+                    self.metrics['semantic_hits'] += 1
+                    return entry.answer, 'semantic'
+            self.metrics['misses'] += 1
+        return None
+
+    def put(self, question: str, answer: str) -> None:
+        """
+        Caches the answer of a self-contained question for the current hero data version
+        :param question: the user question
+        :param answer: the answer of the agent
+        :return:
+        """
+        if not self.enabled or not answer or not is_self_contained(question):
+            return
+        normalized = normalize_question(question)
+        vector = self.encoder.encode([normalized])[0]
+        key = question_key(question)
+        with self._cache_lock:
+            if normalized in self.entries:
+                self.remove(normalized)
+            while not self.free_slots:
+                # evict the least recently used entry
+                self.remove(next(iter(self.entries)))
+            slot = self.free_slots.pop()
+            self.vectors[slot] = vector
+            self.slot_questions[slot] = normalized
+            self.entries[normalized] = CacheEntry(answer, key, HeroDB().version, time.time(), slot)
+            self.metrics['stores'] += 1
+
+    def stats(self) -> Dict:
+        with self._cache_lock:
+            hits = self.metrics['exact_hits'] + self.metrics['semantic_hits']
+            return {
+                **self.metrics,
+                'size': len(self.entries),
+                'hit_rate': hits / self.metrics['lookups'] if self.metrics['lookups'] else 0.0,
+            }
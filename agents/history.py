@@ -0,0 +1,165 @@
+import asyncio
+from typing import List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import Runnable
+
+from agents.rate_limiter import RateLimiter, estimate_request_tokens
+from agents.tool_store import ToolResultStore, result_digest
+from constants import HISTORY_TOKEN_BUDGET, HISTORY_VERBATIM_TURNS
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.tokens import count_message_tokens
+
+logger = ChatDota2Logger()
+
+
+def compact_tool_message(message: ToolMessage, tokens: int) -> ToolMessage:
+    """
+    Replaces the payload of an old tool result by a reference, the model can call the tool again if needed
+    :param message: the tool result
+    :param tokens: the token count of the payload
+    :return:
+    """
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return ToolMessage(
+        content=f"[result of {message.name or 'a tool'} (digest {result_digest(content)}) omitted ({tokens} tokens), "
+                f"calling the tool again with the same arguments returns it instantly]",
+        tool_call_id=message.tool_call_id, name=message.name, additional_kwargs={'compacted': True}
+    )
+
+
+class ChatHistory:
+    """
+    The chat history of a session kept under a token budget. The last `verbatim_turns` turns are kept
+    verbatim with their tool results, the tool results of the older turns are compacted to references and
+    those turns are rolled into a summary updated in the background after each turn
+    """
+
+    def __init__(self, summarizer: Runnable | None = None, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 verbatim_turns: int = HISTORY_VERBATIM_TURNS):
+        """
+        :param summarizer: the runnable taking the `summary` and the `dialogue` and returning the new summary
+        :param token_budget: the maximum number of tokens of the rendered history
+        :param verbatim_turns: the number of recent turns kept verbatim
+        """
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.verbatim_turns = verbatim_turns
+        self.messages: List[BaseMessage] = []
+        self.token_counts: List[int] = []
+        self.summary = ''
+        # the messages before this index are covered by the summary
+        self.summarized_until = 0
+        self.summary_task: asyncio.Task | None = None
+        # the tool results of the session, the repeated tool calls are served from it
+        self.tool_results = ToolResultStore()
+
+    def append(self, message: BaseMessage) -> None:
+        self.messages.append(message)
+        self.token_counts.append(count_message_tokens(message))
+
+    def extend(self, messages: List[BaseMessage]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def turn_starts(self) -> List[int]:
+        return [i for i, message in enumerate(self.messages) if isinstance(message, HumanMessage)]
+
+    def render(self) -> List[BaseMessage]:
+        """
+        Renders the history sent with the next user message, within the token budget. The tool results
+        of the last `verbatim_turns` turns are kept since the follow-up questions are most likely about them
+        :return:
+        """
+        turn_starts = self.turn_starts()
+        # the same window as the one the summary leaves out, see `schedule_summary`
+        verbatim_start = turn_starts[-self.verbatim_turns] if len(turn_starts) >= self.verbatim_turns else 0
+        rendered = []
+        tokens = []
+        # the original index of each rendered message
+        positions = []
+        # the turns that left the window are kept until the summary covers them
+        for i in range(self.summarized_until, len(self.messages)):
+            message, message_tokens = self.messages[i], self.token_counts[i]
+            if isinstance(message, ToolMessage) and i < verbatim_start and not message.additional_kwargs.get('reference'):
+                message = compact_tool_message(message, message_tokens)
+                message_tokens = count_message_tokens(message)
+            rendered.append(message)
+            tokens.append(message_tokens)
+            positions.append(i)
+
+        summary = []
+        if self.summary:
+            summary = [SystemMessage(f"Summary of the earlier conversation: {self.summary}")]
+        budget = self.token_budget - sum(count_message_tokens(message) for message in summary)
+        while True:
+            self.inline_references(rendered, tokens, positions, verbatim_start)
+            # drop the oldest turns until the history fits, the last turn is always kept
+            if sum(tokens) <= budget or not any(isinstance(message, HumanMessage) for message in rendered[1:]):
+                break
+            next_turn = next(i for i, message in enumerate(rendered) if i and isinstance(message, HumanMessage))
+            del rendered[:next_turn], tokens[:next_turn], positions[:next_turn]
+        # the results still sent in full are referenced instead of repeated by the next tool calls
+        self.tool_results.begin_turn({
+            message.tool_call_id for message in rendered
+            if isinstance(message, ToolMessage) and not set(message.additional_kwargs) & {'compacted', 'reference'}
+        })
+        return summary + rendered
+
+    def inline_references(self, rendered: List[BaseMessage], tokens: List[int], positions: List[int],
+                          verbatim_start: int) -> None:
+        """
+        Replaces the references of the verbatim turns whose earlier result is not rendered in full anymore, e.g.
+        compacted or dropped since, by the content of that result so that the model never loses it
+        :param rendered: the rendered messages, updated in place
+        :param tokens: the token count of each rendered message, updated in place
+        :param positions: the index of each rendered message in the history
+        :param verbatim_start: the index of the first message of the verbatim turns
+        :return:
+        """
+        shown = {
+            message.tool_call_id for message in rendered
+            if isinstance(message, ToolMessage) and not set(message.additional_kwargs) & {'compacted', 'reference'}
+        }
+        for index, (message, position) in enumerate(zip(rendered, positions)):
+            target = message.additional_kwargs.get('reference') if isinstance(message, ToolMessage) else None
+            if not target or target in shown or position < verbatim_start:
+                continue
+            original = next((earlier for earlier in self.messages[:position]
+                             if isinstance(earlier, ToolMessage) and earlier.tool_call_id == target), None)
+            if original is None:
+                continue
+            rendered[index] = ToolMessage(content=original.content, tool_call_id=message.tool_call_id, name=message.name)
+            tokens[index] = count_message_tokens(rendered[index])
+            shown.add(message.tool_call_id)
+
+    def schedule_summary(self) -> None:
+        """
+        Rolls the turns that left the verbatim window into the summary, in the background so that the
+        next answer never waits for it
+        :return:
+        """
+        turn_starts = self.turn_starts()
+        if self.summarizer is None or len(turn_starts) <= self.verbatim_turns:
+            return
+        if self.summary_task is not None and not self.summary_task.done():
+            return
+        summarize_until = turn_starts[-self.verbatim_turns]
+        if summarize_until <= self.summarized_until:
+            return
+        self.summary_task = asyncio.create_task(self.update_summary(summarize_until))
+
+    async def update_summary(self, summarize_until: int) -> None:
+        dialogue = '\n'.join(
+            f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+            for message in self.messages[self.summarized_until:summarize_until]
+            if isinstance(message, (HumanMessage, AIMessage)) and message.content
+        )
+        inputs = {'summary': self.summary or 'None', 'dialogue': dialogue}
+        try:
+            # the summaries of all the sessions share one turn of the rate limiter, behind the waiting answers
+            await RateLimiter().acquire('summaries', estimate_request_tokens(self.summarizer, inputs), background=True)
+            self.summary = await self.summarizer.ainvoke(inputs)
+            self.summarized_until = summarize_until
+        except Exception as err:
+            logger.error("The following error occurred while summarizing the chat history: %s", err)
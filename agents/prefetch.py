@@ -0,0 +1,112 @@
+import uuid
+import asyncio
+from threading import Lock
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+from constants import HERO_ALIASES, PREFETCH_MAX_HEROES
+from tools.entity_linker import AhoCorasick
+from tools.executor import run_tool_call
+from tools.hero_db import HeroDB
+from tools.name_resolver import NameResolver, hero_keys
+
+# the aliases this short are common words e.g. "am" in "I am", they only count when typed in uppercase e.g. "AM"
+MAX_AMBIGUOUS_ALIAS_LENGTH = 2
+
+
+def entity_terms(heroes: Dict[str, Dict]) -> Dict[str, Tuple[str, str]]:
+    """
+    Builds the lowercase terms naming the heroes e.g. "anti-mage", "anti mage", "antimage" and "am", and their
+    abilities. All the heroes of the game are named, not only the loaded ones, so that the longer name of
+    another hero wins e.g. "void spirit" over the "void" of Faceless Void, and the abilities are matched too
+    so that a hero alias inside an ability name e.g. "mana void" does not count as a hero mention
+    :param heroes: the hero data by hero key
+    :return: the terms and the (kind, name) they name, the kind being heroes or abilities
+    """
+    terms = {}
+    for hero_name, key in hero_keys(heroes).items():
+        names = [hero_name.replace('_', separator) for separator in (' ', '-', '')]
+        names += [heroes.get(key, {}).get('name') or '', *HERO_ALIASES.get(hero_name, [])]
+        for name in names:
+            if name:
+                terms.setdefault(name.lower(), ('heroes', key))
+    for hero in heroes.values():
+        for ability in list(hero.get('abilities') or []) + [hero.get('innate') or {}]:
+            if ability.get('name'):
+                terms.setdefault(ability['name'].lower(), ('abilities', ability['name']))
+    return terms
+
+
+class HeroPrefetcher:
+    """
+    Finds the heroes named by a user message with an Aho-Corasick automaton over their names, aliases and abilities and
+    loads their data before the first model call. The data is injected as a `get_hero` tool call of the
+    model and its result so that the model can answer in a single call instead of asking for it first
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, max_heroes: int = PREFETCH_MAX_HEROES):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.max_heroes = max_heroes
+        self.build()
+        # rebuild the automaton when the hero data is hot-reloaded
+        HeroDB().subscribe(lambda changed_heroes: self.build())
+        self._initialized = True
+
+    def build(self) -> None:
+        self.automaton = AhoCorasick(entity_terms(HeroDB().heroes))
+
+    def find_heroes(self, text: str) -> List[str]:
+        """
+        Finds the heroes confidently named by a text
+        :param text: the user message
+        :return: the hero keys in order of appearance
+        """
+        # the leftmost longest matches drop the hero aliases inside a longer name, the heroes missing from the
+        # hero data have nothing to prefetch
+        loaded_heroes = HeroDB().heroes
+        heroes = [
+            name for start, end, (kind, name) in self.automaton.find_words(text.lower())
+            if kind == 'heroes' and name in loaded_heroes
+            and (end - start > MAX_AMBIGUOUS_ALIAS_LENGTH or text[start:end].isupper())
+        ]
+        return list(dict.fromkeys(heroes))
+
+    def should_prefetch(self, text: str, heroes: List[str]) -> bool:
+        # the questions about items or comparing many heroes are left to the model to plan
+        return 0 < len(heroes) <= self.max_heroes and not NameResolver().find_mentions(text, 'items')
+
+    async def prefetch(
+        self,
+        text: str,
+        tool_runner: Callable[[Dict], Awaitable[ToolMessage]] = run_tool_call
+    ) -> List[BaseMessage]:
+        """
+        Loads the data of the heroes named by a user message concurrently
+        :param text: the user message
+        :param tool_runner: the coroutine running a tool call e.g. through the tool result store of the session
+        :return: the synthetic `get_hero` tool call message followed by its results, empty when not confident
+        """
+        heroes = self.find_heroes(text)
+        if not self.should_prefetch(text, heroes):
+            return []
+        tool_calls = [
+            {'name': 'get_hero', 'args': {'hero_name': hero_name}, 'id': f"call_prefetch_{uuid.uuid4().hex[:12]}"}
+            for hero_name in heroes
+        ]
+        tool_messages = await asyncio.gather(*(tool_runner(tool_call) for tool_call in tool_calls))
+        if any(tool_message.status == 'error' for tool_message in tool_messages):
+            return []
+        return [AIMessage(content='', tool_calls=tool_calls), *tool_messages]
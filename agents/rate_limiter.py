@@ -0,0 +1,304 @@
+import json
+import math
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Deque, Dict, Tuple
+
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable
+
+from constants import (LLM_OUTPUT_TOKENS_ESTIMATE, LLM_RATE_LIMIT_STORE, LLM_REQUESTS_PER_MINUTE,
+                       LLM_TOKENS_PER_MINUTE, RATE_LIMIT_MAX_QUEUE, RATE_LIMIT_MAX_QUEUE_PER_SESSION,
+                       RATE_LIMIT_MAX_WAIT_SECONDS)
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.tokens import count_message_tokens, count_tokens
+
+logger = ChatDota2Logger()
+
+MAX_RECORDED_WAITS = 1000
+
+
+class RateLimitExceeded(Exception):
+    """ Raised when a model call is rejected because the queue is full or it waited too long """
+
+
+def plan_consumption(levels: Dict[str, Tuple[float, float]], costs: Dict[str, float], capacities: Dict[str, float],
+                     now: float) -> Tuple[Dict[str, Tuple[float, float]], float]:
+    """
+    Refills the token buckets and consumes the costs when all of them can pay
+    :param levels: the (level, updated at) of each bucket, the missing buckets are full
+    :param costs: the cost in each bucket
+    :param capacities: the capacity of each bucket per minute
+    :param now: the current time in seconds
+    :return: the new (level, updated at) of the buckets and the seconds to wait before retrying, 0 when consumed
+    """
+    refilled = {}
+    wait = 0.0
+    for name, capacity in capacities.items():
+        level, updated_at = levels.get(name, (capacity, now))
+        rate = capacity / 60
+        level = min(capacity, level + (now - updated_at) * rate)
+        refilled[name] = (level, now)
+        # a cost larger than the bucket is capped so that it is admitted once the bucket is full
+        cost = min(costs.get(name, 0.0), capacity)
+        if level < cost:
+            wait = max(wait, (cost - level) / rate)
+    if wait:
+        return refilled, wait
+    return {name: (level - min(costs.get(name, 0.0), capacities[name]), now)
+            for name, (level, _) in refilled.items()}, 0.0
+
+
+class MemoryBucketStore:
+    """ The token buckets of the process """
+    blocking = False
+
+    def __init__(self):
+        self.levels: Dict[str, Tuple[float, float]] = {}
+        self._store_lock = Lock()
+
+    def try_consume(self, costs: Dict[str, float], capacities: Dict[str, float]) -> float:
+        with self._store_lock:
+            self.levels, wait = plan_consumption(self.levels, costs, capacities, time.monotonic())
+            return wait
+
+    def adjust(self, name: str, amount: float, capacity: float) -> None:
+        with self._store_lock:
+            level, updated_at = self.levels.get(name, (capacity, time.monotonic()))
+            # the level goes negative when a call used more than reserved, the next calls pay the debt
+            self.levels[name] = (min(capacity, level + amount), updated_at)
+
+
+class SqliteBucketStore:
+    """ The token buckets shared by the worker processes of a host through a sqlite file """
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self.connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, updated_at REAL)"
+            )
+
+    def connect(self) -> sqlite3.Connection:
+        # one connection per thread, the transactions are opened explicitly
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        return self._local.connection
+
+    def transact(self, update) -> float:
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {name: (level, updated_at)
+                      for name, level, updated_at in connection.execute("SELECT name, level, updated_at FROM buckets")}
+            levels, result = update(levels)
+            connection.executemany(
+                "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                [(name, level, updated_at) for name, (level, updated_at) in levels.items()]
+            )
+            connection.execute("COMMIT")
+            return result
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def try_consume(self, costs: Dict[str, float], capacities: Dict[str, float]) -> float:
+        # the wall clock is shared by the processes unlike the monotonic one
+        return self.transact(lambda levels: plan_consumption(levels, costs, capacities, time.time()))
+
+    def adjust(self, name: str, amount: float, capacity: float) -> None:
+        def update(levels):
+            level, updated_at = levels.get(name, (capacity, time.time()))
+            return {name: (min(capacity, level + amount), updated_at)}, 0.0
+        self.transact(update)
+
+
+def estimate_request_tokens(llm_agent: Runnable, inputs: Dict,
+                            output_tokens: int = LLM_OUTPUT_TOKENS_ESTIMATE) -> int:
+    """
+    Estimates the tokens a model call counts against the tokens per minute limit: the prompt messages,
+    the bound tool schemas and the reserved output tokens
+    :param llm_agent: the prompt | model runnable e.g. returned by `get_llm_agent`
+    :param inputs: the prompt inputs
+    :param output_tokens: the output tokens reserved
+    :return:
+    """
+    prompt = getattr(llm_agent, 'first', None)
+    if isinstance(prompt, BasePromptTemplate):
+        messages = prompt.format_messages(**inputs)
+        tokens = sum(count_message_tokens(message) for message in messages)
+    else:
+        tokens = count_tokens(json.dumps(inputs, default=str))
+    tools = getattr(getattr(llm_agent, 'last', None), 'kwargs', {}).get('tools')
+    if tools:
+        tokens += count_tokens(json.dumps(tools))
+    return tokens + output_tokens
+
+
+class Waiter:
+    def __init__(self, tokens: int, future: asyncio.Future, background: bool = False):
+        self.tokens = tokens
+        self.future = future
+        self.background = background
+        self.enqueued_at = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Admits the model calls of all the sessions under the requests and tokens per minute limits of the account
+    so that a burst queues here instead of hitting 429s and retries. The waiting calls are admitted in round
+    robin across the sessions so that a busy session cannot starve the others, the background calls e.g. the
+    history summaries only go when no answer is waiting. The queue is bounded in total and
+    per session and a call is rejected at once when either is full or after waiting `max_wait` seconds
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 max_queue: int = RATE_LIMIT_MAX_QUEUE, max_session_queue: int = RATE_LIMIT_MAX_QUEUE_PER_SESSION,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS, store_path: str | None = LLM_RATE_LIMIT_STORE):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.capacities = {'requests': float(requests_per_minute), 'tokens': float(tokens_per_minute)}
+        self.max_queue = max_queue
+        self.max_session_queue = max_session_queue
+        self.max_wait = max_wait
+        self.store = SqliteBucketStore(store_path) if store_path else MemoryBucketStore()
+        # the waiting calls of each session, in round robin order of the sessions
+        self.queues: OrderedDict[str, Deque[Waiter]] = OrderedDict()
+        self.queued = 0
+        self.pump_task: asyncio.Task | None = None
+        self.metrics = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0}
+        self.waits: Deque[float] = deque(maxlen=MAX_RECORDED_WAITS)
+        self._initialized = True
+
+    async def try_consume(self, tokens: int) -> float:
+        costs = {'requests': 1.0, 'tokens': float(tokens)}
+        if self.store.blocking:
+            return await asyncio.to_thread(self.store.try_consume, costs, self.capacities)
+        return self.store.try_consume(costs, self.capacities)
+
+    async def acquire(self, session_id: str, tokens: int, background: bool = False) -> None:
+        """
+        Waits until a model call fits in the limits and reserves its budget
+        :param session_id: the session making the call, the sessions are served in turn
+        :param tokens: the estimated tokens of the call
+        :param background: whether nobody waits for the call, it is only admitted when no other call is waiting
+        :return:
+        """
+        if not self.queues and not await self.try_consume(tokens):
+            self.metrics['admitted'] += 1
+            self.waits.append(0.0)
+            return
+        if self.queued >= self.max_queue:
+            self.metrics['rejected'] += 1
+            logger.warning("Rejected a model call of the session %s, %s calls are already queued",
+                           session_id, self.queued)
+            raise RateLimitExceeded(f"{self.queued} model calls are already waiting for the rate limit")
+        session_queued = len(self.queues.get(session_id, ()))
+        if session_queued >= self.max_session_queue:
+            self.metrics['rejected'] += 1
+            logger.warning("Rejected a model call of the session %s, %s of its calls are already queued",
+                           session_id, session_queued)
+            raise RateLimitExceeded(f"{session_queued} model calls of the session are already waiting for the rate limit")
+
+        waiter = Waiter(tokens, asyncio.get_running_loop().create_future(), background)
+        self.queues.setdefault(session_id, deque()).append(waiter)
+        self.queued += 1
+        self.metrics['queued'] += 1
+        if self.pump_task is None or self.pump_task.done():
+            self.pump_task = asyncio.create_task(self.pump())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.discard(session_id, waiter)
+            self.metrics['timed_out'] += 1
+            logger.warning("A model call of the session %s waited more than %ss for the rate limit",
+                           session_id, self.max_wait)
+            raise RateLimitExceeded(f"The model call waited more than {self.max_wait}s for the rate limit")
+        except BaseException:
+            # the waiting session was cancelled
+            self.discard(session_id, waiter)
+            raise
+        self.waits.append(time.monotonic() - waiter.enqueued_at)
+
+    def pop(self, session_id: str) -> None:
+        queue = self.queues[session_id]
+        queue.popleft()
+        self.queued -= 1
+        if queue:
+            # the next call of this session waits for the other sessions
+            self.queues.move_to_end(session_id)
+        else:
+            del self.queues[session_id]
+
+    def discard(self, session_id: str, waiter: Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # the call was admitted just as it gave up, the budget reserved for it goes back to the buckets
+            self.settle(waiter.tokens, 0, requests=1)
+            return
+        waiter.future.cancel()
+        queue = self.queues.get(session_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            self.queued -= 1
+            if not queue:
+                del self.queues[session_id]
+
+    async def pump(self) -> None:
+        while self.queues:
+            # the first session in turn with a call that is not in the background, or else the first one
+            session_id = next((session_id for session_id, queue in self.queues.items() if not queue[0].background),
+                              next(iter(self.queues)))
+            waiter = self.queues[session_id][0]
+            wait = await self.try_consume(waiter.tokens)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            if not self.queues.get(session_id) or self.queues[session_id][0] is not waiter:
+                # the call gave up while its budget was being reserved, the budget goes back to the buckets
+                self.settle(waiter.tokens, 0, requests=1)
+                continue
+            self.pop(session_id)
+            self.metrics['admitted'] += 1
+            waiter.future.set_result(None)
+
+    def settle(self, estimated_tokens: int, used_tokens: int | None, requests: int = 0) -> None:
+        """
+        Gives back the reserved tokens the call did not use, or charges the ones it used over its reservation
+        :param estimated_tokens: the tokens reserved by `acquire`
+        :param used_tokens: the tokens reported by the provider, None when unknown
+        :param requests: the requests to give back
+        :return:
+        """
+        if used_tokens is not None and used_tokens != estimated_tokens:
+            self.store.adjust('tokens', estimated_tokens - used_tokens, self.capacities['tokens'])
+        if requests:
+            self.store.adjust('requests', requests, self.capacities['requests'])
+
+    def stats(self) -> Dict:
+        waits = sorted(self.waits)
+        return {
+            **self.metrics,
+            'waiting': self.queued,
+            'waiting_sessions': len(self.queues),
+            'mean_wait_seconds': sum(waits) / len(waits) if waits else 0.0,
+            # the nearest rank, the smallest wait that 95% of the calls did not exceed
+            'p95_wait_seconds': waits[math.ceil(0.95 * len(waits)) - 1] if waits else 0.0,
+            'max_wait_seconds': waits[-1] if waits else 0.0,
+        }
@@ -0,0 +1,216 @@
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from tools.hero_db import HeroDB
+from tools.hero_stats import primary_attribute
+from tools.name_resolver import MAX_MENTION_WORDS, NameResolver, compact_name, mention_words
+
+# the basic stats answered from the hero data, by intent, with their label and their field
+STAT_INTENTS = {
+    'health': ('base health', 'base_health'),
+    'health_regeneration': ('base health regeneration', 'base_health_regeneration'),
+    'mana': ('base mana', 'base_mana'),
+    'mana_regeneration': ('base mana regeneration', 'base_mana_regeneration'),
+    'armor': ('base armor', 'base_armor'),
+    'magic_resistance': ('base magic resistance', 'base_magic_resistence'),
+    'damage': ('base damage', 'base_damage'),
+    'attack_range': ('attack range', 'attack_range'),
+    'attack_speed': ('attack speed', 'attack_speed'),
+    'movement_speed': ('movement speed', 'day_movement_speed'),
+    'turn_rate': ('turn rate', 'turn_rate'),
+}
+ATTRIBUTE_INTENTS = ['strength', 'agility', 'intelligence']
+# the ability costs answered from the spellcards, by intent, with the label of the scraped cost
+ABILITY_INTENTS = {'cooldown': 'Cooldown', 'mana_cost': 'Mana Cost'}
+
+# the phrases naming an intent
+INTENT_PHRASES = {
+    'health': 'health', 'hp': 'health', 'health pool': 'health',
+    'health regen': 'health_regeneration', 'health regeneration': 'health_regeneration', 'hp regen': 'health_regeneration',
+    'mana': 'mana', 'mana pool': 'mana',
+    'mana regen': 'mana_regeneration', 'mana regeneration': 'mana_regeneration',
+    'armor': 'armor', 'armour': 'armor',
+    'magic resistance': 'magic_resistance', 'magic resist': 'magic_resistance', 'magic res': 'magic_resistance',
+    'damage': 'damage', 'attack damage': 'damage',
+    'attack range': 'attack_range', 'range': 'attack_range',
+    'attack speed': 'attack_speed',
+    'movement speed': 'movement_speed', 'move speed': 'movement_speed', 'movespeed': 'movement_speed', 'ms': 'movement_speed',
+    'turn rate': 'turn_rate',
+    'strength': 'strength', 'str': 'strength', 'agility': 'agility', 'agi': 'agility',
+    'intelligence': 'intelligence', 'int': 'intelligence',
+    'main attribute': 'primary_attribute', 'primary attribute': 'primary_attribute',
+    'main attr': 'primary_attribute', 'primary attr': 'primary_attribute',
+    'cooldown': 'cooldown', 'cooldowns': 'cooldown', 'cd': 'cooldown',
+    'mana cost': 'mana_cost', 'mana costs': 'mana_cost', 'manacost': 'mana_cost',
+    'roles': 'roles', 'role': 'roles',
+    'talents': 'talents', 'talent tree': 'talents', 'talent': 'talents',
+}
+# the phrases picking an ability of the hero by its position
+ABILITY_SELECTORS = {
+    'ultimate': -1, 'ult': -1, 'ulti': -1,
+    'first': 0, '1st': 0, 'second': 1, '2nd': 1, 'third': 2, '3rd': 2,
+    'innate': 'innate',
+}
+# the words carrying no meaning of their own in a lookup question, any other word sends the question to the agent
+FILLER_WORDS = {
+    'a', 'an', 'the', 'what', 'whats', 'which', 'is', 'are', 'does', 'do', 'has', 'have', 'how', 'much', 'many',
+    'of', 'on', 'for', 'base', 'starting', 'hero', 'ability', 'spell', 'skill', 'tell', 'me', 'show', 'give',
+    'please', 'value', 'his', 'her', 'its',
+}
+
+
+class Route(NamedTuple):
+    hero: str
+    intent: str
+    # the ability name for the ability intents
+    ability: str | None = None
+
+
+def match_spans(words: List[str], covered: List[bool], lookup: Callable[[str], object]) -> List[Tuple[int, object]]:
+    """
+    Matches the longest phrases of the words not covered yet, the matched words are marked as covered
+    :param words: the words of the question
+    :param covered: whether each word is already explained
+    :param lookup: the function returning the value of a phrase, None if the phrase is unknown
+    :return: the (start word, value) of the matches
+    """
+    matches = []
+    i = 0
+    while i < len(words):
+        for length in range(min(MAX_MENTION_WORDS, len(words) - i), 0, -1):
+            if any(covered[i:i + length]):
+                continue
+            value = lookup(' '.join(words[i:i + length]))
+            if value is not None:
+                matches.append((i, value))
+                covered[i:i + length] = [True] * length
+                i += length
+                break
+        else:
+            i += 1
+    return matches
+
+
+def select_ability(hero: Dict, selector) -> Dict | None:
+    if selector == 'innate':
+        return hero.get('innate') or None
+    abilities = list(hero.get('abilities') or [])
+    return abilities[selector] if -len(abilities) <= selector < len(abilities) else None
+
+
+def route_question(question: str) -> Route | None:
+    """
+    Routes a single fact lookup e.g. "Sven base armor" or "Lina ultimate cooldown" to the hero data. A question is
+    only routed when it names exactly one hero, one intent and, for the ability intents, one ability, and when
+    all its other words are filler words
+    :param question: the user question
+    :return: the route, None when the question has to go to the agent
+    """
+    name_resolver = NameResolver()
+    words = mention_words(question)
+    covered = [False] * len(words)
+    if not words:
+        return None
+
+    def lookup_entity(phrase: str) -> Tuple[str, str] | None:
+        key = compact_name(phrase)
+        for kind in ('heroes', 'abilities'):
+            if key in name_resolver.names[kind].aliases:
+                return kind, name_resolver.names[kind].aliases[key]
+        return None
+
+    # the heroes and the abilities are matched together so that the longest name wins e.g. "mana void"
+    # is the ability and not "mana" followed by the "void" alias of Faceless Void
+    entities = [entity for _, entity in match_spans(words, covered, lookup_entity)]
+    heroes = {name for kind, name in entities if kind == 'heroes'}
+    abilities = {name for kind, name in entities if kind == 'abilities'}
+    intents = [intent for _, intent in match_spans(words, covered, INTENT_PHRASES.get)]
+    selectors = [selector for _, selector in match_spans(words, covered, ABILITY_SELECTORS.get)]
+    if any(not is_covered and word not in FILLER_WORDS for word, is_covered in zip(words, covered)):
+        return None
+    if len(set(intents)) != 1 or len(heroes) > 1:
+        return None
+    intent = intents[0]
+
+    if intent not in ABILITY_INTENTS:
+        if abilities or selectors or len(heroes) != 1:
+            return None
+        return Route(heroes.pop(), intent)
+
+    # the ability intents need exactly one ability, named or picked by its position
+    if len(abilities) + len(selectors) != 1:
+        return None
+    if abilities:
+        owners = [
+            hero for hero, _ in name_resolver.resolve_ability(next(iter(abilities)))
+            if not heroes or hero in heroes
+        ]
+        return Route(owners[0], intent, next(iter(abilities))) if len(owners) == 1 else None
+    if len(heroes) != 1:
+        return None
+    hero = next(iter(heroes))
+    ability = select_ability(HeroDB().heroes.get(hero) or {}, selectors[0])
+    return Route(hero, intent, ability['name']) if ability and ability.get('name') else None
+
+
+def find_ability(hero: Dict, ability_name: str) -> Tuple[Dict, bool] | None:
+    abilities = list(hero.get('abilities') or [])
+    for position, ability in enumerate(abilities):
+        if ability.get('name') == ability_name:
+            return ability, position == len(abilities) - 1
+    innate = hero.get('innate') or {}
+    return (innate, False) if innate.get('name') == ability_name else None
+
+
+def render_route(route: Route) -> str | None:
+    """
+    Renders the answer of a route from the hero data as a templated Markdown
+    :param route: the route of the question
+    :return: the answer, None when the hero data misses the field
+    """
+    hero = HeroDB().heroes.get(route.hero)
+    if hero is None:
+        return None
+    hero_name = f"**{hero['name']}**"
+    basic_stats = hero.get('basic_stats') or {}
+
+    if route.intent in STAT_INTENTS:
+        label, field = STAT_INTENTS[route.intent]
+        value = basic_stats.get(field)
+        return f"{hero_name} {label}: **{value}**" if value else None
+    if route.intent in ATTRIBUTE_INTENTS:
+        attribute = (basic_stats.get('attributes') or {}).get(route.intent) or {}
+        if not attribute.get('base_attribute'):
+            return None
+        return (f"{hero_name} base {route.intent}: **{attribute['base_attribute']}** "
+                f"(+{attribute.get('attribute_gain')} per level)")
+    if route.intent == 'primary_attribute':
+        return f"{hero_name} main attribute: **{primary_attribute(hero)}**"
+    if route.intent == 'roles':
+        roles = (hero.get('summary_info') or {}).get('roles')
+        return f"{hero_name} roles: {', '.join(roles)}" if roles else None
+    if route.intent == 'talents':
+        talent_tree = hero.get('talent_tree')
+        if not talent_tree:
+            return None
+        return '\n'.join([f"{hero_name} talents:"] + [
+            f"- Level {level}: {talents.get('left', '')} / {talents.get('right', '')}"
+            for level, talents in sorted(talent_tree.items(), key=lambda talent: int(talent[0]), reverse=True)
+        ])
+    if route.intent in ABILITY_INTENTS:
+        found = find_ability(hero, route.ability)
+        value = ((found[0].get('costs') or {}).get(ABILITY_INTENTS[route.intent]) if found else None)
+        if not value:
+            return None
+        ultimate = ' (ultimate)' if found[1] else ''
+        return f"{hero_name} - *{route.ability}*{ultimate} {ABILITY_INTENTS[route.intent].lower()}: **{value}**"
+    return None
+
+
+def answer_directly(question: str) -> str | None:
+    """
+    Answers a single fact lookup straight from the hero data, without calling the model
+    :param question: the user question
+    :return: the Markdown answer, None when the question has to go to the agent
+    """
+    route = route_question(question)
+    return render_route(route) if route is not None else None
@@ -0,0 +1,64 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, List
+
+from constants import STREAM_FLUSH_CHARS, STREAM_FLUSH_INTERVAL_SECONDS
+
+
+class TokenCoalescer:
+    """
+    Coalesces the streamed tokens into frames so that the client gets one websocket message per frame
+    instead of one per token. A frame is sent once it holds `max_chars` characters or `interval` seconds
+    after the previous one, the first token is sent right away so that the time to first token is unchanged
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[None]], interval: float = STREAM_FLUSH_INTERVAL_SECONDS,
+                 max_chars: int = STREAM_FLUSH_CHARS):
+        """
+        :param send: the coroutine sending a frame e.g. `Message.stream_token`
+        :param interval: the maximum number of seconds a token waits in the buffer
+        :param max_chars: the number of buffered characters sent without waiting
+        """
+        self.send = send
+        self.interval = interval
+        self.max_chars = max_chars
+        self.buffer: List[str] = []
+        self.size = 0
+        self.last_flush = float('-inf')
+        self.timer: asyncio.Task | None = None
+        # the frames are sent in order even when the timer and a full buffer flush at the same time
+        self._send_lock = asyncio.Lock()
+
+    async def add(self, token: str) -> None:
+        if not token:
+            return
+        self.buffer.append(token)
+        self.size += len(token)
+        wait = self.interval - (time.monotonic() - self.last_flush)
+        if self.size >= self.max_chars or wait <= 0:
+            await self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.create_task(self.flush_later(wait))
+
+    async def flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        if self.timer is not None and self.timer is not asyncio.current_task():
+            self.timer.cancel()
+        self.timer = None
+        if not self.buffer:
+            return
+        frame = ''.join(self.buffer)
+        self.buffer, self.size = [], 0
+        self.last_flush = time.monotonic()
+        async with self._send_lock:
+            await self.send(frame)
+
+    async def close(self) -> None:
+        """
+        Sends the buffered tokens at the end of the stream
+        :return:
+        """
+        await self.flush()
@@ -0,0 +1,80 @@
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Set, Tuple
+
+from langchain_core.messages import ToolMessage
+
+from constants import TOOL_STORE_SIZE
+from tools.executor import run_tool_call
+from tools.hero_db import HeroDB
+
+
+class StoredResult(NamedTuple):
+    content: str
+    digest: str
+    # the id of the most recent tool call whose message carries the full content
+    tool_call_id: str
+
+
+def tool_call_key(tool_call: Dict) -> Tuple[str, str, int]:
+    """
+    Keys a tool call by its name, its canonical arguments and the hero data version so that a reload
+    never serves a stale result
+    :param tool_call: the tool call of the model
+    :return:
+    """
+    return tool_call['name'], json.dumps(tool_call['args'], sort_keys=True, default=str), HeroDB().version
+
+
+def result_digest(content: str) -> str:
+    return hashlib.sha1(content.encode()).hexdigest()[:10]
+
+
+class ToolResultStore:
+    """
+    The tool results of one session. A repeated tool call is served from the store without running the
+    tool, and when the full result is still in the context sent to the model it is answered with a
+    reference to the earlier message instead of the payload
+    """
+
+    def __init__(self, max_size: int = TOOL_STORE_SIZE):
+        self.max_size = max_size
+        self.results: OrderedDict[Tuple[str, str, int], StoredResult] = OrderedDict()
+        # the ids of the tool messages whose full content is in the context of the current turn
+        self.visible_tool_call_ids: Set[str] = set()
+
+    def begin_turn(self, visible_tool_call_ids: Set[str]) -> None:
+        self.visible_tool_call_ids = set(visible_tool_call_ids)
+
+    async def run_tool_call(self, tool_call: Dict) -> ToolMessage:
+        """
+        Runs a tool call through the store
+        :param tool_call: the tool call of the model with its name, args and id
+        :return:
+        """
+        key = tool_call_key(tool_call)
+        stored = self.results.get(key)
+        if stored is not None:
+            self.results.move_to_end(key)
+            if stored.tool_call_id in self.visible_tool_call_ids:
+                return ToolMessage(
+                    content=f"[same result as the earlier call {stored.tool_call_id} (digest {stored.digest})]",
+                    tool_call_id=tool_call['id'], name=tool_call['name'],
+                    # the id of the referenced call, see `ChatHistory.inline_references`
+                    additional_kwargs={'reference': stored.tool_call_id}
+                )
+            self.remember(key, stored.content, tool_call['id'])
+            return ToolMessage(content=stored.content, tool_call_id=tool_call['id'], name=tool_call['name'])
+
+        message = await run_tool_call(tool_call)
+        if message.status != 'error':
+            self.remember(key, message.content, tool_call['id'])
+        return message
+
+    def remember(self, key: Tuple[str, str, int], content: str, tool_call_id: str) -> None:
+        self.results[key] = StoredResult(content, result_digest(content), tool_call_id)
+        self.results.move_to_end(key)
+        self.visible_tool_call_ids.add(tool_call_id)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
@@ -0,0 +1,67 @@
+from threading import Lock
+from typing import Dict
+
+from custom_logger.custom_logger import ChatDota2Logger
+
+logger = ChatDota2Logger()
+
+
+class UsageTracker:
+    """
+    Accumulates the token usage reported by the model calls, in particular the input tokens served
+    from the provider prompt cache, and their time to first token
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self._stats_lock = Lock()
+        self.model_calls = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+        self.time_to_first_token = 0.0
+        self._initialized = True
+
+    def record(self, usage_metadata: Dict | None, time_to_first_token: float | None = None) -> None:
+        """
+        Records the usage of one model call
+        :param usage_metadata: the `usage_metadata` of the AIMessage e.g. {"input_tokens": 2000,
+        "output_tokens": 50, "input_token_details": {"cache_read": 1792}}
+        :param time_to_first_token: the seconds between the request and the first streamed chunk
+        :return:
+        """
+        usage_metadata = usage_metadata or {}
+        input_tokens = usage_metadata.get('input_tokens', 0)
+        cached_input_tokens = (usage_metadata.get('input_token_details') or {}).get('cache_read', 0) or 0
+        with self._stats_lock:
+            self.model_calls += 1
+            self.input_tokens += input_tokens
+            self.cached_input_tokens += cached_input_tokens
+            self.output_tokens += usage_metadata.get('output_tokens', 0)
+            self.time_to_first_token += time_to_first_token or 0.0
+        logger.info("Model call used %s input tokens (%s cached) and %s output tokens, first token after %.3fs",
+                    input_tokens, cached_input_tokens, usage_metadata.get('output_tokens', 0),
+                    time_to_first_token or 0.0)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'model_calls': self.model_calls,
+                'input_tokens': self.input_tokens,
+                'cached_input_tokens': self.cached_input_tokens,
+                'output_tokens': self.output_tokens,
+                'cached_input_ratio': self.cached_input_tokens / self.input_tokens if self.input_tokens else 0.0,
+                'mean_time_to_first_token': self.time_to_first_token / self.model_calls if self.model_calls else 0.0,
+            }
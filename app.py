@@ -1,14 +1,50 @@
 import chainlit as cl
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
-
-from agents.agents import get_llm_agent
-from tools import tools_mapping
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents.agent_loop import run_agent
+from agents.agents import get_llm_agent, get_summary_agent
+from agents.answer_cache import AnswerCache
+from agents.history import ChatHistory
+from agents.prefetch import HeroPrefetcher
+from agents.rate_limiter import RateLimitExceeded
+from agents.router import answer_directly
+from agents.streaming import TokenCoalescer
+from constants import LLM_MODEL
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.ability_index import AbilityIndex
+from tools.hero_db import HeroDB
+from tools.hero_renderer import HeroRenderer
+from tools.hero_stats import HeroStats
+from tools.hero_table import HeroRanking
+from tools.item_recipes import RecipeGraph
+from tools.mechanics_index import MechanicsIndex
+from tools.name_resolver import NameResolver
+from tools.vector_index import VectorIndex
+
+logger = ChatDota2Logger()
+
+BUSY_MESSAGE = "Too many questions are being answered right now, please ask again in a moment."
+
+# load the prebuilt mechanics index, the vector index, the name resolver, the hero renderings, the hero stats tables,
+# the ability index, the item recipe graph and the hero prefetch automaton once at startup
+MechanicsIndex()
+VectorIndex()
+NameResolver()
+HeroRenderer()
+HeroStats()
+HeroRanking()
+AbilityIndex()
+RecipeGraph()
+HeroPrefetcher()
+# hot-reload the hero data after a rescrape
+HeroDB().start_watching()
+# build the shared agent and its connection pool before the first session
+get_llm_agent(model=LLM_MODEL, temperature=0.0)
 
 def chat_setup():
-    llm_agent = get_llm_agent(model='gpt-4.1-mini', temperature=0.0)
-    cl.user_session.set('llm_agent', llm_agent)
-    cl.user_session.set('chat_history', [])
+    # the agent is shared by all the sessions, only the chat history is per session
+    cl.user_session.set('chat_history', ChatHistory(summarizer=get_summary_agent(model=LLM_MODEL, temperature=0.0)))
     # cl.user_session.set('langsmith_client', LangsmithClient())
 
 @cl.password_auth_callback
@@ -28,15 +64,13 @@ def on_chat_start():
 @cl.on_chat_resume
 def on_chat_resume(thread):
     chat_setup()
-    chat_history = []
+    chat_history = cl.user_session.get('chat_history')
     for step in thread.get('steps', []):
         if step['type'] == 'user_message':
             chat_history.append(HumanMessage(step['output']))
         elif step['type'] == 'assistant_message':
             chat_history.append(AIMessage(step['output']))
 
-    cl.user_session.set('chat_history', chat_history)
-
 
 @cl.on_message  # this function will be called every time a user inputs a message in the UI
 async def main(message: cl.Message):
@@ -55,56 +89,78 @@ async def main(message: cl.Message):
     #    "metadata": {"thread_id": cl.context.session.thread_id}
     # }
     user_message = message.content
-    cl.user_session.get('chat_history').append(HumanMessage(user_message))
-    llm_agent = cl.user_session.get('llm_agent')
-    assistant_message = ""
+    chat_history = cl.user_session.get('chat_history')
+    llm_agent = get_llm_agent(model=LLM_MODEL, temperature=0.0)
     tmp_message = cl.Message("")
-    tool_responses = []
-    async for event in llm_agent.astream_events(
-        {
-            'user_message': user_message,
-            'chat_history': cl.user_session.get('chat_history')
-        },
-        config=RunnableConfig(
-            callbacks=[cl.LangchainCallbackHandler()],
-            # configurable={"langsmith_extra": langsmith_extra},
-        )
-    ):
-        if event['event'] == 'on_chat_model_stream':
-            await tmp_message.stream_token(token=event['data']['chunk'].content)
-            assistant_message += event['data']['chunk'].content
-        elif event['event'] == 'on_chat_model_end' and event['data']['output'].tool_calls:
-            for tool_call in event['data']['output'].tool_calls:
-                tool_to_run = tools_mapping[tool_call['name']]
-                tool_args = tool_call['args']
-                tool_response = ToolMessage(content=tool_to_run(**tool_args), tool_call_id=tool_call['id'])
-                tool_responses.append(tool_response)
-
-    # call again the llm agent if there are any tool_responses
-    if tool_responses:
-
-        cl.user_session.get('chat_history').extend(tool_responses)
-        async for event in llm_agent.astream_events(
-                {
-                    'user_message': user_message,
-                    'chat_history': cl.user_session.get('chat_history')
-                },
-                config=RunnableConfig(
-                    callbacks=[cl.LangchainCallbackHandler()],
-                    # configurable={"langsmith_extra": langsmith_extra},
-                )
-        ):
-            if event['event'] == 'on_chat_model_stream':
-                await tmp_message.stream_token(token=event['data']['chunk'].content)
-                assistant_message += event['data']['chunk'].content
 
+    # the single fact lookups are answered straight from the hero data, the other questions may be cached
+    fast_answer = answer_directly(user_message)
+    if fast_answer is not None:
+        logger.info("Answered from the hero data by the fast-path router")
+    else:
+        cached_answer = AnswerCache().get(user_message)
+        if cached_answer is not None:
+            logger.info("Answered from the answer cache (%s hit)", cached_answer[1])
+            fast_answer = cached_answer[0]
+    if fast_answer is not None:
+        await tmp_message.stream_token(token=fast_answer)
+        tmp_message.content = fast_answer
+        await tmp_message.send()
+        chat_history.append(HumanMessage(user_message))
+        chat_history.append(AIMessage(fast_answer))
+        return
+
+    # render the history first, it decides which earlier tool results the context of this turn still holds
+    rendered_history = chat_history.render()
+    # the data of the heroes named by the message is loaded up front so that the model can answer in a single call
+    prefetched = await HeroPrefetcher().prefetch(user_message, tool_runner=chat_history.tool_results.run_tool_call)
+    if prefetched:
+        logger.info("Prefetched the hero data of %s", [tool_call['args']['hero_name'] for tool_call in prefetched[0].tool_calls])
+
+    # the tokens are sent to the client in frames instead of one websocket message each
+    token_stream = TokenCoalescer(lambda frame: tmp_message.stream_token(token=frame))
+    busy = False
+    try:
+        # loop over the model and the tools until the model answers, each tool starts as soon as its call is streamed
+        assistant_message, intermediate_steps, truncated = await run_agent(
+            llm_agent,
+            {
+                'user_message': user_message,
+                'chat_history': rendered_history
+            },
+            on_token=token_stream.add,
+            config=RunnableConfig(
+                callbacks=[cl.LangchainCallbackHandler()],
+                # configurable={"langsmith_extra": langsmith_extra},
+            ),
+            # the repeated tool calls of the session are served from its tool result store
+            tool_runner=chat_history.tool_results.run_tool_call,
+            scratchpad=prefetched,
+            # the sessions take turns under the rate limits of the account
+            session_id=cl.context.session.id
+        )
+    except RateLimitExceeded:
+        busy = True
+    finally:
+        await token_stream.close()
 
+    # the tokens still buffered were flushed above, the busy message replaces them
+    if busy:
+        tmp_message.content = BUSY_MESSAGE
+        await tmp_message.send()
+        return
 
     tmp_message.content = assistant_message
     await tmp_message.send()
-
-
-    cl.user_session.get('chat_history').append(AIMessage(assistant_message))
+    # an answer cut at the step limit is not worth serving again
+    if not truncated:
+        AnswerCache().put(user_message, assistant_message)
+
+    # keep the tool calls and their results in the history for the follow-up questions
+    chat_history.append(HumanMessage(user_message))
+    chat_history.extend(intermediate_steps)
+    chat_history.append(AIMessage(assistant_message))
+    chat_history.schedule_summary()
 
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
+import os
 from typing import Literal
 
 DEFAULT_CHROME_OPTIONS = [
@@ -38,3 +39,72 @@ HEROES = Literal[
     "enigma", "io", "magnus", "marci", "natures_prophet", "nyx_assassin", "pangolier", "sand_king",
     "snapfire", "spectre", "techies", "venomancer", "visage", "void_spirit", "windranger"
 ]
+
+HERO_DATA_PATH = 'hero_data'
+HERO_DATA_POLL_INTERVAL = 5.0
+ITEMS_DATA_PATH = 'items'
+ITEM_CATEGORIES = ['shop_items', 'neutral_items', 'enchantments']
+ITEM_SECTIONS = Literal['cost', 'recipe', 'active', 'passive', 'properties', 'sections']
+MECHANICS_DATA_PATH = 'mechanics'
+MECHANICS_INDEX_PATH = 'mechanics_index.json'
+MECHANICS_TITLES_FILE = 'mechanics_titles.json'
+VECTOR_ENCODER = 'hashing'
+VECTOR_SOURCES = Literal['heroes', 'items', 'mechanics']
+
+# common community nicknames, the names themselves and their acronyms are derived automatically
+HERO_ALIASES = {
+    "ancient_apparition": ["aa"], "anti_mage": ["am", "magina"], "arc_warden": ["arc", "zet"],
+    "bloodseeker": ["bs", "blood"], "bounty_hunter": ["bh", "gondar"], "centaur_warrunner": ["centaur", "cent"],
+    "chaos_knight": ["ck"], "clockwerk": ["clock", "rattletrap"], "crystal_maiden": ["cm", "rylai"],
+    "dark_seer": ["ds"], "dark_willow": ["willow"], "death_prophet": ["dp", "krobelus"],
+    "doom": ["doom bringer"], "dragon_knight": ["dk", "davion"], "drow_ranger": ["drow", "traxex"],
+    "earthshaker": ["es", "shaker"], "elder_titan": ["et"], "ember_spirit": ["ember", "xin"],
+    "faceless_void": ["fv", "void", "faceless"], "io": ["wisp"], "keeper_of_the_light": ["kotl", "keeper"],
+    "legion_commander": ["lc", "legion"], "lifestealer": ["naix"], "lone_druid": ["ld", "sylla"],
+    "monkey_king": ["mk"], "naga_siren": ["naga"], "natures_prophet": ["np", "furion", "prophet"],
+    "necrophos": ["necro", "necrolyte"], "night_stalker": ["ns", "balanar"], "nyx_assassin": ["nyx"],
+    "ogre_magi": ["ogre"], "outworld_destroyer": ["od", "outworld devourer", "obsidian destroyer"],
+    "phantom_assassin": ["pa", "mortred"], "phantom_lancer": ["pl"], "primal_beast": ["pb"],
+    "queen_of_pain": ["qop", "akasha"], "sand_king": ["sk"], "shadow_demon": ["sd"],
+    "shadow_fiend": ["sf", "nevermore"], "shadow_shaman": ["shaman", "rhasta"], "skywrath_mage": ["sky", "skywrath"],
+    "spirit_breaker": ["sb", "bara"], "storm_spirit": ["storm"], "templar_assassin": ["ta", "lanaya"],
+    "terrorblade": ["tb"], "timbersaw": ["timber"], "treant_protector": ["treant"], "troll_warlord": ["troll"],
+    "underlord": ["pitlord", "abyssal underlord"], "vengeful_spirit": ["venge"], "winter_wyvern": ["ww", "wyvern"],
+    "witch_doctor": ["wd"], "windranger": ["wr", "windrunner"], "wraith_king": ["wk", "skeleton king"],
+    "zeus": ["zuus"],
+}
+MAX_HERO_LEVEL = 30
+HERO_STATS = Literal[
+    'strength', 'agility', 'intelligence', 'health', 'health_regeneration', 'mana', 'mana_regeneration',
+    'armor', 'damage', 'attack_speed'
+]
+TOOL_WORKERS = 8
+TOOL_TIMEOUT_SECONDS = 20.0
+MAX_AGENT_STEPS = 5
+LLM_MODEL = 'gpt-4.1-mini'
+LLM_MAX_CONNECTIONS = 100
+LLM_KEEPALIVE_SECONDS = 60.0
+LLM_TIMEOUT_SECONDS = 120.0
+HISTORY_TOKEN_BUDGET = 4000
+HISTORY_VERBATIM_TURNS = 3
+TOOL_STORE_SIZE = 100
+ANSWER_CACHE_SIZE = 1000
+ANSWER_CACHE_TTL_SECONDS = 6 * 60 * 60
+ANSWER_CACHE_SIMILARITY = 0.85
+# the streamed tokens are sent to the client in frames of at most this many seconds or characters,
+# both can be set per deployment through the environment
+STREAM_FLUSH_INTERVAL_SECONDS = float(os.getenv('STREAM_FLUSH_INTERVAL_SECONDS', 0.03))
+STREAM_FLUSH_CHARS = int(os.getenv('STREAM_FLUSH_CHARS', 64))
+# the most heroes a message can name for their data to be prefetched
+PREFETCH_MAX_HEROES = 2
+# the limits of the OpenAI account shared by all the sessions, and optionally by all the workers through a sqlite
+# file, both can be set per deployment through the environment
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', 500))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', 200_000))
+LLM_RATE_LIMIT_STORE = os.getenv('LLM_RATE_LIMIT_STORE')
+# the output tokens reserved for a model call until its actual usage is known
+LLM_OUTPUT_TOKENS_ESTIMATE = 1000
+RATE_LIMIT_MAX_QUEUE = 200
+# the calls a single session, or the shared summaries lane, can have waiting so that it cannot fill the queue
+RATE_LIMIT_MAX_QUEUE_PER_SESSION = 4
+RATE_LIMIT_MAX_WAIT_SECONDS = 30.0
@@ -0,0 +1,215 @@
+"""
+Drives many concurrent simulated chat sessions through the app handlers against the local fake OpenAI
+server and reports the time to first token, the tokens per second, the p50/p95/p99 turn latencies, the
+event loop lag, the memory per session and the token usage of the model calls
+
+    python -m loadtest.driver --users 100 --turns 3 --tokens-per-second 50 --latency 0.3
+"""
+import gc
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List
+
+QUESTIONS = [
+    "What does Axe's ultimate do?",
+    "How much mana does it cost at level 3?",
+    "Which items counter him?",
+    "Who has the highest base armor?",
+    "What does Black King Bar build from?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"The fake OpenAI server did not start on the port {port}")
+
+
+def rss_bytes() -> int:
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+async def monitor_loop_lag(lags: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """
+    Measures how late the event loop wakes up a sleeping task, a blocking call in a handler shows up as lag
+    :param lags: the list the lags are appended to, in seconds
+    :param stop: the event stopping the monitor
+    :param interval: the sleep interval in seconds
+    :return:
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def run_session(user: int, turns: int, resume: bool, results: Dict[str, List[float]]) -> None:
+    """
+    Runs the turns of one simulated user in its own chainlit context
+    :param user: the index of the user
+    :param turns: the number of questions asked
+    :param resume: whether the session is resumed from a persisted thread instead of started
+    :param results: the metrics the measurements are appended to
+    :return:
+    """
+    import chainlit as cl
+    from chainlit.context import init_http_context
+    from chainlit.emitter import BaseChainlitEmitter
+
+    import app
+    from tools.tokens import count_tokens
+
+    class RecordingEmitter(BaseChainlitEmitter):
+        # records when the streamed tokens reach the client instead of sending them over a socket
+        def __init__(self, session):
+            super().__init__(session)
+            self.first_token_at = None
+            self.tokens = []
+            self.frames = 0
+
+        async def send_token(self, id: str, token: str, is_sequence=False, is_input=False):
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.tokens.append(token)
+            self.frames += 1
+
+    context = init_http_context(user_env={})
+    emitter = RecordingEmitter(context.session)
+    context.emitter = emitter
+
+    if resume:
+        app.on_chat_resume({'steps': [
+            {'type': 'user_message', 'output': QUESTIONS[0]},
+            {'type': 'assistant_message', 'output': 'Culling Blade executes the enemies below its threshold.'},
+        ]})
+    else:
+        app.on_chat_start()
+
+    for turn in range(turns):
+        emitter.first_token_at, emitter.tokens, emitter.frames = None, [], 0
+        started_at = time.perf_counter()
+        try:
+            await app.main(cl.Message(content=QUESTIONS[(user + turn) % len(QUESTIONS)]))
+        except Exception as err:
+            results['errors'].append(f"{type(err).__name__}: {err}")
+            continue
+        finished_at = time.perf_counter()
+        results['latency'].append(finished_at - started_at)
+        results['frames'].append(emitter.frames)
+        if emitter.first_token_at is not None:
+            results['ttft'].append(emitter.first_token_at - started_at)
+            streaming_time = finished_at - emitter.first_token_at
+            if streaming_time > 0:
+                results['tokens_per_second'].append(count_tokens(''.join(emitter.tokens)) / streaming_time)
+
+
+async def run_load_test(users: int, turns: int, resume: bool) -> Dict:
+    import app
+    from agents.rate_limiter import RateLimiter
+    from agents.usage import UsageTracker
+
+    gc.collect()
+    rss_before = rss_bytes()
+    results = {'latency': [], 'ttft': [], 'tokens_per_second': [], 'frames': [], 'errors': []}
+    lags, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lags, stop))
+
+    started_at = time.perf_counter()
+    sessions = [asyncio.create_task(run_session(user, turns, resume, results)) for user in range(users)]
+    await asyncio.gather(*sessions)
+    duration = time.perf_counter() - started_at
+    stop.set()
+    await monitor
+    gc.collect()
+
+    return {
+        'users': users,
+        'turns': users * turns,
+        'errors': len(results['errors']),
+        'first_errors': results['errors'][:3],
+        'duration_seconds': duration,
+        'turns_per_second': len(results['latency']) / duration,
+        'latency_seconds': percentiles(results['latency']),
+        'ttft_seconds': percentiles(results['ttft']),
+        'tokens_per_second': percentiles(results['tokens_per_second']),
+        # the websocket messages sent per answer
+        'frames_per_turn': percentiles(results['frames']),
+        'loop_lag_seconds': {**percentiles(lags), 'max': max(lags, default=0.0)},
+        # the sessions are still referenced by the chainlit user sessions at this point
+        'memory_per_session_kib': (rss_bytes() - rss_before) / users / 1024,
+        'answer_cache': app.AnswerCache().stats(),
+        'rate_limiter': RateLimiter().stats(),
+        # the cached tokens are the longest prompt prefix the fake server already saw, i.e. how stable the prompts are
+        'usage': UsageTracker().stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=50, help='the number of concurrent sessions')
+    parser.add_argument('--turns', type=int, default=3, help='the number of questions per session')
+    parser.add_argument('--resume', action='store_true', help='resume the sessions from a persisted thread')
+    parser.add_argument('--answer-cache', action='store_true', help='keep the answer cache on')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0, help='the streaming rate of the fake model')
+    parser.add_argument('--latency', type=float, default=0.3, help='the seconds before the first token')
+    parser.add_argument('--answer-tokens', type=int, default=150)
+    parser.add_argument('--script', default=json.dumps([[{'name': 'get_hero', 'args': {'hero_name': 'Axe'}}]]),
+                        help='the tool call rounds of the fake model, see loadtest.fake_openai')
+    parser.add_argument('--port', type=int, default=0, help='the port of the fake server, a free one by default')
+    parser.add_argument('--output', help='the JSON file the report is also written to')
+    args = parser.parse_args()
+
+    port = args.port or free_port()
+    server = subprocess.Popen([
+        sys.executable, '-m', 'loadtest.fake_openai', '--port', str(port),
+        '--tokens-per-second', str(args.tokens_per_second), '--latency', str(args.latency),
+        '--answer-tokens', str(args.answer_tokens), '--script', args.script,
+    ], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        wait_for_port(port)
+        # the app builds its shared client on import so the fake server has to be configured first
+        os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{port}/v1"
+        os.environ.setdefault('OPENAI_API_KEY', 'loadtest')
+        from agents.answer_cache import AnswerCache
+        AnswerCache().enabled = args.answer_cache
+
+        report = asyncio.run(run_load_test(args.users, args.turns, args.resume))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
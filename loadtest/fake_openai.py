@@ -0,0 +1,184 @@
+"""
+A local OpenAI compatible chat completions server streaming canned answers at a configurable token rate,
+with a configurable latency before the first token and scripted rounds of tool calls. Used by
+`loadtest.driver` to load test the app entirely offline
+
+    python -m loadtest.fake_openai --port 8765 --tokens-per-second 50 --latency 0.3 \
+        --script '[[{"name": "get_hero", "args": {"hero_name": "axe"}}]]'
+"""
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import argparse
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_WORDS = (
+    "Axe is a strength melee initiator. Berserker's Call taunts the nearby enemies, Battle Hunger slows and "
+    "damages a target over time, Counter Helix spins on being attacked and Culling Blade executes the enemies "
+    "below its threshold. "
+).split(' ')
+
+# the prompt cache of the provider only serves the prefixes of at least 1024 tokens, in increments of 128 tokens
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_INCREMENT = 128
+MAX_CACHED_PREFIXES = 100_000
+
+app = FastAPI()
+app.state.settings = {'tokens_per_second': 50.0, 'latency': 0.3, 'answer_tokens': 150, 'script': []}
+# the digests of the prompt prefixes already sent, in least recently used order
+app.state.prefixes = OrderedDict()
+
+
+def answer_tokens(count: int) -> List[str]:
+    return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + ' ' for i in range(count)]
+
+
+def tool_round(messages: List[Dict]) -> int:
+    """
+    Counts the tool call rounds the model already made since the last user message
+    :param messages: the messages of the request
+    :return:
+    """
+    rounds = 0
+    for message in reversed(messages):
+        if message.get('role') == 'user':
+            break
+        if message.get('role') == 'assistant' and message.get('tool_calls'):
+            rounds += 1
+    return rounds
+
+
+def chunk(completion_id: str, model: str, delta: Dict | None, finish_reason: str | None = None,
+          usage: Dict | None = None) -> str:
+    payload = {
+        'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+        'choices': [] if delta is None else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+    }
+    if usage is not None:
+        payload['usage'] = usage
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def prompt_prefixes(body: Dict) -> List[Tuple[str, int]]:
+    """
+    Digests the prefixes of the prompt the way the provider prompt cache sees it: the tool schemas, then the
+    messages one by one
+    :param body: the request
+    :return: the (digest, estimated tokens) of each prefix ending at a message, the last one is the whole prompt
+    """
+    digest = hashlib.sha1(json.dumps(body.get('tools') or [], sort_keys=True).encode())
+    characters = 0
+    prefixes = []
+    for message in body.get('messages', []):
+        serialized = json.dumps(message, sort_keys=True)
+        digest.update(serialized.encode())
+        characters += len(serialized)
+        prefixes.append((digest.hexdigest(), characters // 4))
+    return prefixes
+
+
+def usage_of(body: Dict, completion_tokens: int) -> Dict:
+    prefixes = prompt_prefixes(body)
+    prompt_tokens = prefixes[-1][1] if prefixes else 0
+    # the longest prefix already sent by an earlier request is served from the cache, like the provider does
+    # from 1024 tokens on and in increments of 128 tokens
+    seen = app.state.prefixes
+    cached_tokens = max((tokens for digest, tokens in prefixes if digest in seen), default=0)
+    cached_tokens = cached_tokens // PROMPT_CACHE_INCREMENT * PROMPT_CACHE_INCREMENT \
+        if cached_tokens >= PROMPT_CACHE_MIN_TOKENS else 0
+    for digest, _ in prefixes:
+        seen[digest] = None
+        seen.move_to_end(digest)
+    while len(seen) > MAX_CACHED_PREFIXES:
+        seen.popitem(last=False)
+    return {
+        'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'prompt_tokens_details': {'cached_tokens': cached_tokens},
+    }
+
+
+async def stream_completion(body: Dict):
+    settings = app.state.settings
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    model = body.get('model', 'fake')
+    delay = 1.0 / settings['tokens_per_second']
+    await asyncio.sleep(settings['latency'])
+    yield chunk(completion_id, model, {'role': 'assistant', 'content': ''})
+
+    step = tool_round(body.get('messages', []))
+    if body.get('tools') and step < len(settings['script']):
+        completion_tokens = 0
+        for index, tool_call in enumerate(settings['script'][step]):
+            arguments = json.dumps(tool_call.get('args', {}))
+            yield chunk(completion_id, model, {'tool_calls': [{
+                'index': index, 'id': f"call_{uuid.uuid4().hex[:12]}", 'type': 'function',
+                'function': {'name': tool_call['name'], 'arguments': ''},
+            }]})
+            # the arguments are streamed in pieces like the real API does
+            for start in range(0, len(arguments), 8):
+                await asyncio.sleep(delay)
+                completion_tokens += 1
+                yield chunk(completion_id, model, {'tool_calls': [{
+                    'index': index, 'function': {'arguments': arguments[start:start + 8]}
+                }]})
+        yield chunk(completion_id, model, {}, 'tool_calls')
+    else:
+        tokens = answer_tokens(settings['answer_tokens'])
+        for token in tokens:
+            await asyncio.sleep(delay)
+            yield chunk(completion_id, model, {'content': token})
+        completion_tokens = len(tokens)
+        yield chunk(completion_id, model, {}, 'stop')
+
+    if (body.get('stream_options') or {}).get('include_usage'):
+        yield chunk(completion_id, model, None, usage=usage_of(body, completion_tokens))
+    yield "data: [DONE]\n\n"
+
+
+@app.post('/v1/chat/completions')
+@app.post('/chat/completions')
+async def chat_completions(request: Request):
+    body = await request.json()
+    if body.get('stream'):
+        return StreamingResponse(stream_completion(body), media_type='text/event-stream')
+
+    # the non streaming calls e.g. the history summarizer get the whole answer at once
+    settings = app.state.settings
+    tokens = answer_tokens(min(settings['answer_tokens'], 60))
+    await asyncio.sleep(settings['latency'] + len(tokens) / settings['tokens_per_second'])
+    return JSONResponse({
+        'id': f"chatcmpl-{uuid.uuid4().hex}", 'object': 'chat.completion', 'created': int(time.time()),
+        'model': body.get('model', 'fake'),
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)}, 'finish_reason': 'stop'}],
+        'usage': usage_of(body, len(tokens)),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--latency', type=float, default=0.3, help='the seconds before the first token')
+    parser.add_argument('--answer-tokens', type=int, default=150)
+    parser.add_argument('--script', default='[]',
+                        help='the JSON list of the tool call rounds made before answering, each round a list '
+                             'of {"name": ..., "args": {...}}')
+    args = parser.parse_args()
+    app.state.settings = {
+        'tokens_per_second': args.tokens_per_second, 'latency': args.latency,
+        'answer_tokens': args.answer_tokens, 'script': json.loads(args.script),
+    }
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
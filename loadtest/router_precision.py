@@ -0,0 +1,63 @@
+"""
+Measures the precision and the coverage of the fast-path router on a labelled set of questions, a routed
+question counts as correct when the hero, the intent and the ability all match the label. The cases labelled
+with a hero missing from the loaded hero data are skipped
+
+    python -m loadtest.router_precision --eval-set loadtest/router_eval.json
+"""
+import os
+import json
+import time
+import argparse
+
+from agents.router import answer_directly, route_question
+from tools.hero_db import HeroDB
+
+EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'router_eval.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--eval-set', default=EVAL_SET, help='the JSON list of {"question", "route"} cases')
+    parser.add_argument('--verbose', action='store_true', help='print the wrong and the missed routes')
+    args = parser.parse_args()
+
+    with open(args.eval_set) as eval_file:
+        cases = json.load(eval_file)
+
+    heroes = HeroDB().heroes
+    counts = {'cases': 0, 'skipped': 0, 'routed': 0, 'correct': 0, 'expected': 0}
+    latencies = []
+    for case in cases:
+        expected = tuple(case['route']) if case['route'] else None
+        if expected and expected[0] not in heroes:
+            counts['skipped'] += 1
+            continue
+        counts['cases'] += 1
+        counts['expected'] += expected is not None
+
+        started_at = time.perf_counter()
+        route = route_question(case['question'])
+        answer = answer_directly(case['question'])
+        latencies.append(time.perf_counter() - started_at)
+        # the question is only answered directly when the hero data has the field
+        if answer is None:
+            route = None
+
+        routed = tuple(value for value in route if value is not None) if route else None
+        counts['routed'] += routed is not None
+        counts['correct'] += routed is not None and routed == expected
+        if args.verbose and routed != expected:
+            print(f"{case['question']!r}: routed to {routed}, expected {expected}")
+
+    print(json.dumps({
+        **counts,
+        'precision': counts['correct'] / counts['routed'] if counts['routed'] else 0.0,
+        'coverage': counts['correct'] / counts['expected'] if counts['expected'] else 0.0,
+        'mean_latency_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        'max_latency_ms': max(latencies, default=0.0) * 1000,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares the cost of streaming a response with `astream`, the path of `run_agent`, and with `astream_events`,
+its former path, on a fake chat model behind the same prompt layout as the agent so that only the
+streaming overhead is measured
+
+    python -m loadtest.stream_benchmark --responses 200 --answer-tokens 300
+"""
+import time
+import asyncio
+import argparse
+import itertools
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from agents.agent_loop import stream_response
+
+
+async def stream_response_with_events(
+    llm_agent: Runnable,
+    inputs: Dict,
+    on_token: Callable[[str], Awaitable[None]],
+    on_tool_call_chunks: Callable[[List[Dict]], None],
+    config: RunnableConfig | None = None,
+) -> Tuple[AIMessageChunk | None, float | None]:
+    # the former streaming path of `run_agent`, filtering the events of every runnable of the chain
+    output = None
+    started_at = time.monotonic()
+    time_to_first_token = None
+    async for event in llm_agent.astream_events(inputs, config=config):
+        if event['event'] == 'on_chat_model_stream':
+            if time_to_first_token is None:
+                time_to_first_token = time.monotonic() - started_at
+            chunk = event['data']['chunk']
+            if chunk.content:
+                await on_token(chunk.content)
+            if chunk.tool_call_chunks:
+                on_tool_call_chunks(chunk.tool_call_chunks)
+        elif event['event'] == 'on_chat_model_end':
+            output = event['data']['output']
+    return output, time_to_first_token
+
+
+def build_agent(answer_tokens: int) -> Runnable:
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You are a Dota 2 expert."),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{user_message}"),
+        MessagesPlaceholder("agent_scratchpad", optional=True),
+    ])
+    # the fake model streams the answer word by word, one chunk per word and one per space
+    answer = ' '.join(f"word{i}" for i in range((answer_tokens + 1) // 2))
+    return prompt | GenericFakeChatModel(messages=itertools.repeat(AIMessage(answer)))
+
+
+async def benchmark(streamer: Callable, llm_agent: Runnable, responses: int) -> Dict[str, float]:
+    chunks = 0
+
+    async def on_token(token: str) -> None:
+        nonlocal chunks
+        chunks += 1
+
+    inputs = {'user_message': "What does Axe's ultimate do?", 'chat_history': [], 'agent_scratchpad': []}
+    started_at, cpu_started_at = time.perf_counter(), time.process_time()
+    for _ in range(responses):
+        await streamer(llm_agent, inputs, on_token=on_token, on_tool_call_chunks=lambda tool_call_chunks: None)
+    duration, cpu_time = time.perf_counter() - started_at, time.process_time() - cpu_started_at
+    return {
+        'chunks_per_second': chunks / duration,
+        'cpu_ms_per_response': cpu_time / responses * 1000,
+        'cpu_us_per_chunk': cpu_time / chunks * 1_000_000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--responses', type=int, default=200, help='the number of streamed responses per path')
+    parser.add_argument('--answer-tokens', type=int, default=300, help='the number of chunks per response')
+    args = parser.parse_args()
+
+    llm_agent = build_agent(args.answer_tokens)
+    # warm up the imports and the lazily built schemas of both paths
+    asyncio.run(benchmark(stream_response, llm_agent, 2))
+    asyncio.run(benchmark(stream_response_with_events, llm_agent, 2))
+
+    results = {
+        'astream': asyncio.run(benchmark(stream_response, llm_agent, args.responses)),
+        'astream_events': asyncio.run(benchmark(stream_response_with_events, llm_agent, args.responses)),
+    }
+    print(f"{'path':<16}{'chunks/s':>12}{'cpu ms/response':>18}{'cpu us/chunk':>15}")
+    for path, result in results.items():
+        print(f"{path:<16}{result['chunks_per_second']:>12.0f}{result['cpu_ms_per_response']:>18.2f}"
+              f"{result['cpu_us_per_chunk']:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+import os
+import sys
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+# the data paths of constants.py are relative, the tests run on a copy of the small data set of tests/data
+# so that the tests writing hero files and the log file leave the tree untouched
+DATA_PATH = tempfile.mkdtemp(prefix='100k-mmr-bot-tests-')
+shutil.copytree(os.path.join(ROOT, 'tests', 'data'), DATA_PATH, dirs_exist_ok=True)
+os.chdir(DATA_PATH)
@@ -0,0 +1,24 @@
+from tools.ability_index import ability_properties
+
+
+def effects(description, **fields):
+    return ability_properties({'description': description, **fields})
+
+
+def test_break_is_the_ability_applying_it():
+    assert 'break' in effects('Applies Break to the target, disabling its passive abilities.')
+    assert 'break' not in effects('Spins and damages the nearby enemies when attacked.',
+                                  extra_descriptions=['Disabled by Break.'])
+
+
+def test_piercing_debuff_immunity_is_not_spell_immunity():
+    properties = effects('Stuns the target. Pierces debuff immunity.')
+    assert 'pierces_debuff_immunity' in properties
+    assert 'spell_immunity' not in properties
+    assert 'spell_immunity' in effects('Grants spell immunity for 3 seconds.')
+
+
+def test_mana_burn_stays_within_a_sentence():
+    assert 'mana_burn' in effects('Each attack burns 40 mana from the target.')
+    assert 'mana_burn' not in effects('Burns the ground under the enemies. Allies restore 20 mana per second.')
+    assert 'mana_burn' not in effects('Burns the ground under the enemies', extra_descriptions=['Costs mana.'])
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk, ToolMessage
+from langchain_core.runnables import RunnableGenerator
+
+from agents.agent_loop import run_agent
+from agents.rate_limiter import RateLimiter
+
+
+async def always_calls_a_tool(inputs):
+    async for _ in inputs:
+        pass
+    yield AIMessageChunk(content='Let me look at Axe first. ', tool_call_chunks=[
+        {'name': 'get_hero', 'args': '{"hero_name": "axe"}', 'id': 'call_axe', 'index': 0}
+    ])
+
+
+async def echo_tool(tool_call):
+    return ToolMessage(content='axe data', tool_call_id=tool_call['id'], name=tool_call['name'])
+
+
+async def ignore_token(token):
+    pass
+
+
+def test_run_cut_at_the_step_limit_is_truncated():
+    answer, steps, truncated = asyncio.run(run_agent(
+        RunnableGenerator(always_calls_a_tool), {'user_message': 'How do I play Axe?'}, on_token=ignore_token,
+        max_steps=2, tool_runner=echo_tool, session_id='agent-loop-test'
+    ))
+
+    # the text written before the dropped tool calls is returned but flagged
+    assert answer.startswith('Let me look at Axe first.')
+    assert truncated
+    assert [message.content for message in steps if isinstance(message, ToolMessage)] == ['axe data']
+
+
+async def fails_midway(inputs):
+    async for _ in inputs:
+        pass
+    yield AIMessageChunk(content='Axe is')
+    raise ConnectionError('the stream was cut')
+
+
+def test_failed_model_call_gives_its_reservation_back(monkeypatch):
+    monkeypatch.setattr(RateLimiter, '_instance', None)
+    rate_limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=100_000, store_path=None)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run_agent(RunnableGenerator(fails_midway), {'user_message': 'How do I play Axe?'},
+                              on_token=ignore_token, tool_runner=echo_tool, session_id='agent-loop-test'))
+    assert rate_limiter.store.levels['requests'][0] == 10
+    assert rate_limiter.store.levels['tokens'][0] == 100_000
@@ -0,0 +1,26 @@
+import pytest
+
+from agents.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = AnswerCache()
+    for question in list(cache.entries):
+        cache.remove(question)
+    # any close wording is a semantic candidate, only the key of the question can tell them apart
+    monkeypatch.setattr(cache, 'similarity', 0.5)
+    return cache
+
+
+def test_similar_question_with_another_number_misses(cache):
+    cache.put('What is the armor of Axe at level 15?', 'Axe has 8.2 armor at level 15')
+
+    assert cache.get('What is the armor of Axe at level 16?') is None
+    assert cache.get('How much armor does Axe have at level 15?') == ('Axe has 8.2 armor at level 15', 'semantic')
+
+
+def test_similar_question_about_another_stat_misses(cache):
+    cache.put('What is the base armor of Axe at level 1?', 'Axe has 1 armor')
+
+    assert cache.get('What is the base damage of Axe at level 1?') is None
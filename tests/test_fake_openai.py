@@ -0,0 +1,14 @@
+from loadtest.fake_openai import usage_of
+
+
+def test_cached_tokens_are_the_longest_prefix_already_sent():
+    system = {'role': 'system', 'content': 'rules ' * 1000}
+    first = usage_of({'messages': [system, {'role': 'user', 'content': 'How do I play Axe?'}]}, 10)
+    follow_up = usage_of({'messages': [system, {'role': 'user', 'content': 'How do I play Axe?'},
+                                       {'role': 'assistant', 'content': 'Jump in with Blink Dagger.'}]}, 10)
+    other = usage_of({'messages': [{'role': 'system', 'content': 'other ' * 1000}]}, 10)
+
+    assert first['prompt_tokens_details']['cached_tokens'] == 0
+    assert 1024 <= follow_up['prompt_tokens_details']['cached_tokens'] <= first['prompt_tokens']
+    assert follow_up['prompt_tokens_details']['cached_tokens'] % 128 == 0
+    assert other['prompt_tokens_details']['cached_tokens'] == 0
@@ -0,0 +1,17 @@
+from langchain_core.messages import ToolMessage
+
+from tools import tokens
+from tools.hero_renderer import HeroRenderer
+from tools.tokens import count_message_tokens
+
+
+def test_hero_rendering_is_counted_from_its_load_time_count(monkeypatch):
+    rendered_hero = HeroRenderer().get('axe')
+    assert rendered_hero.tokens > 0
+
+    def encode_again(*args, **kwargs):
+        raise AssertionError('the rendering was encoded again')
+
+    monkeypatch.setattr(tokens, 'get_encoding', encode_again)
+    message = ToolMessage(content=rendered_hero.text, tool_call_id='call_axe', name='get_hero')
+    assert count_message_tokens(message) == rendered_hero.tokens + tokens.MESSAGE_TOKEN_OVERHEAD
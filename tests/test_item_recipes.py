@@ -0,0 +1,9 @@
+from tools.item_recipes import RecipeGraph
+
+
+def test_component_used_twice_is_counted_twice():
+    build = RecipeGraph().build_tree('twin_ogre_axe')
+
+    assert build['recipe_cost'] == 500
+    assert build['base_components'] == {'Ogre Axe': 2, 'Recipe (Twin Ogre Axe)': 1}
+    assert [component['item'] for component in build['tree']['components']] == ['Ogre Axe', 'Ogre Axe', 'Recipe']
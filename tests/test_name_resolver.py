@@ -0,0 +1,15 @@
+from tools.hero_db import HeroDB
+from tools.name_resolver import NameResolver
+from tools.tools import get_hero
+
+
+def test_names_resolve_to_the_scraped_hero_key():
+    # the scraper stores Anti-Mage under "anti-mage" while the HEROES literal spells it "anti_mage"
+    assert 'anti-mage' in HeroDB().heroes
+    name_resolver = NameResolver()
+
+    for name in ['Anti-Mage', 'anti mage', 'antimage', 'anti_mage', 'am', 'magina', 'anti mag']:
+        assert name_resolver.resolve_hero(name) == 'anti-mage'
+    assert name_resolver.resolve_hero('OD') == 'outworld_destroyer'
+    assert name_resolver.suggest('anti_mage')[0] == 'anti-mage'
+    assert get_hero('Anti-Mage').startswith('# anti-mage')
@@ -0,0 +1,80 @@
+import asyncio
+
+import chainlit as cl
+from chainlit.context import init_http_context
+from langchain_core.messages import ToolMessage
+
+import app
+from agents.answer_cache import AnswerCache
+from agents.prefetch import HeroPrefetcher
+
+
+def run_turns(monkeypatch, questions, verbatim_turns):
+    """
+    Runs the questions through `app.main` with the agent loop replaced by one answering right away
+    :return: the (rendered history, prefetched messages) the agent loop received at each turn
+    """
+    calls = []
+
+    async def fake_run_agent(llm_agent, inputs, on_token, scratchpad=None, **kwargs):
+        calls.append((inputs['chat_history'], list(scratchpad or [])))
+        return 'answer', list(scratchpad or []), False
+
+    monkeypatch.setattr(app, 'run_agent', fake_run_agent)
+    monkeypatch.setattr(AnswerCache(), 'enabled', False)
+
+    async def session():
+        init_http_context(user_env={})
+        app.on_chat_start()
+        cl.user_session.get('chat_history').verbatim_turns = verbatim_turns
+        for question in questions:
+            await app.main(cl.Message(content=question))
+
+    asyncio.run(session())
+    return calls
+
+
+def test_hero_asked_again_two_turns_later_gets_its_data(monkeypatch):
+    calls = run_turns(monkeypatch, ['How do I play Axe?', 'How do I play Anti-Mage?', 'Axe laning tips?'],
+                      verbatim_turns=1)
+    rendered, prefetched = calls[-1]
+
+    # the first Axe result left the verbatim window of this turn, the prefetch has to carry the data again
+    assert any(isinstance(message, ToolMessage) and message.additional_kwargs.get('compacted') for message in rendered)
+    assert not prefetched[1].additional_kwargs.get('reference')
+    assert prefetched[1].content.startswith('# axe')
+
+
+def test_hero_alias_inside_an_ability_name_is_not_prefetched():
+    # "void" is an alias of Faceless Void but "mana void" is the ultimate of Anti-Mage
+    assert HeroPrefetcher().find_heroes('how does mana void work') == []
+    assert HeroPrefetcher().find_heroes('How do I play Axe?') == ['axe']
+    assert HeroPrefetcher().find_heroes('Is void good against Axe?') == ['faceless_void', 'axe']
+
+
+def test_hero_alias_inside_the_name_of_a_missing_hero_is_not_prefetched():
+    # Void Spirit is not in the hero data, its name still wins over the "void" alias of Faceless Void
+    assert HeroPrefetcher().find_heroes('How do I counter void spirit?') == []
+    assert HeroPrefetcher().find_heroes('How do I play AM?') == ['anti-mage']
+
+
+def test_hero_asked_again_within_the_verbatim_turns_is_referenced(monkeypatch):
+    calls = run_turns(monkeypatch, ['How do I play Axe?', 'How do I play Anti-Mage?', 'Axe laning tips?'],
+                      verbatim_turns=3)
+    rendered, prefetched = calls[-1]
+
+    # both earlier turns are verbatim, their tool results are sent in full and the prefetch points to them
+    assert not any(message.additional_kwargs.get('compacted') for message in rendered)
+    assert prefetched[1].additional_kwargs.get('reference')
+
+
+def test_reference_keeps_its_result_once_the_referenced_turn_is_compacted(monkeypatch):
+    calls = run_turns(monkeypatch, ['How do I play Axe?', 'Axe laning tips?', 'How do I play Anti-Mage?',
+                                    'Anti-Mage farming tips?'], verbatim_turns=2)
+    rendered, _ = calls[-1]
+    tool_messages = [message for message in rendered if isinstance(message, ToolMessage)]
+
+    # the first Axe result left the verbatim turns, the second turn referred to it and now carries it in full
+    assert tool_messages[0].additional_kwargs.get('compacted')
+    assert not tool_messages[1].additional_kwargs.get('reference')
+    assert tool_messages[1].content.startswith('# axe')
@@ -0,0 +1,73 @@
+import time
+import asyncio
+
+import pytest
+
+from agents.rate_limiter import RateLimitExceeded, RateLimiter, Waiter
+
+
+def test_p95_wait_is_the_nearest_rank(monkeypatch):
+    rate_limiter = RateLimiter()
+    # one call in ten waited, it is above the 95th percentile rank of the 10 calls
+    monkeypatch.setattr(rate_limiter, 'waits', [0.0] * 9 + [3.0])
+
+    assert rate_limiter.stats()['p95_wait_seconds'] == 3.0
+
+
+def test_one_session_cannot_fill_the_queue(monkeypatch):
+    monkeypatch.setattr(RateLimiter, '_instance', None)
+    # a single request per minute, every call after the first one waits
+    rate_limiter = RateLimiter(requests_per_minute=1, max_queue=10, max_session_queue=2, store_path=None)
+
+    async def scenario():
+        await rate_limiter.acquire('busy', 10)
+        waiting = [asyncio.create_task(rate_limiter.acquire('busy', 10)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitExceeded):
+            await rate_limiter.acquire('busy', 10)
+        waiting.append(asyncio.create_task(rate_limiter.acquire('other', 10)))
+        await asyncio.sleep(0)
+        queued = rate_limiter.queued
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        return queued
+
+    assert asyncio.run(scenario()) == 3
+    assert rate_limiter.metrics['rejected'] == 1
+
+
+def test_background_calls_go_after_the_waiting_answers(monkeypatch):
+    monkeypatch.setattr(RateLimiter, '_instance', None)
+    # ten requests per second from an empty bucket, every call waits
+    rate_limiter = RateLimiter(requests_per_minute=600, store_path=None)
+    rate_limiter.store.levels['requests'] = (0.0, time.monotonic())
+    admitted = []
+
+    async def call(session_id, background=False):
+        await rate_limiter.acquire(session_id, 10, background=background)
+        admitted.append(session_id)
+
+    async def scenario():
+        summary = asyncio.create_task(call('summaries', background=True))
+        await asyncio.sleep(0)
+        await asyncio.gather(summary, call('session'))
+
+    asyncio.run(scenario())
+    assert admitted == ['session', 'summaries']
+
+
+def test_call_admitted_as_it_gives_up_gets_its_budget_back(monkeypatch):
+    monkeypatch.setattr(RateLimiter, '_instance', None)
+    rate_limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000, store_path=None)
+
+    async def scenario():
+        # the pump admitted the call, consuming its budget, right when its wait timed out
+        waiter = Waiter(100, asyncio.get_running_loop().create_future())
+        await rate_limiter.try_consume(waiter.tokens)
+        waiter.future.set_result(None)
+        rate_limiter.discard('late', waiter)
+
+    asyncio.run(scenario())
+    assert rate_limiter.store.levels['requests'][0] == 10
+    assert rate_limiter.store.levels['tokens'][0] == 1000
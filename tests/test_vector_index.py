@@ -0,0 +1,32 @@
+import os
+import json
+
+from constants import HERO_DATA_PATH
+from tools.hero_db import HeroDB
+from tools.vector_index import VectorIndex
+
+
+def test_hot_reloaded_hero_text_is_searched():
+    vector_index = VectorIndex()
+    path = os.path.join(HERO_DATA_PATH, 'Axe.json')
+    with open(path) as hero_file:
+        original = hero_file.read()
+    hero = json.loads(original)
+    hero['abilities'][3]['description'] = 'Executes the enemies below a threshold and grants a zyzzyva haste.'
+    mtime = os.path.getmtime(path)
+    try:
+        with open(path, 'w') as hero_file:
+            json.dump(hero, hero_file)
+        os.utime(path, (mtime + 1, mtime + 1))
+        HeroDB().reload()
+
+        [result] = vector_index.search('zyzzyva haste', k=1, sources=['heroes'])
+        assert (result['name'], result['section']) == ('axe', 'Culling Blade')
+        assert 'zyzzyva' in result['text']
+    finally:
+        with open(path, 'w') as hero_file:
+            hero_file.write(original)
+        os.utime(path, (mtime + 2, mtime + 2))
+        HeroDB().reload()
+
+    assert vector_index.search('zyzzyva haste', k=1, sources=['heroes']) == []
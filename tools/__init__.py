@@ -1,3 +1,6 @@
-from tools.tools import get_hero
+from tools.tools import find_abilities, get_hero, get_hero_stats_at_level, get_item, item_build_tree, rank_heroes, search_mechanics, semantic_search
 
-tools_mapping = {'get_hero': get_hero}
\ No newline at end of file
+tools_mapping = {'get_hero': get_hero, 'get_item': get_item,
+                 'search_mechanics': search_mechanics, 'semantic_search': semantic_search,
+                 'get_hero_stats_at_level': get_hero_stats_at_level, 'rank_heroes': rank_heroes,
+                 'find_abilities': find_abilities, 'item_build_tree': item_build_tree}
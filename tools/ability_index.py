@@ -0,0 +1,175 @@
+import re
+import difflib
+from threading import Lock
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from tools.hero_db import HeroDB
+from tools.item_db import normalize_name
+
+# effect keyword -> the pattern detecting it in the ability texts
+EFFECT_KEYWORDS = {
+    'stun': r"\bstun(?:s|ned|ning)?\b|mini-stun",
+    'silence': r"\bsilenc(?:e|es|ed|ing)\b",
+    'root': r"\broot(?:s|ed|ing)?\b|\bensnare",
+    'slow': r"\bslow(?:s|ed|ing)?\b",
+    'disarm': r"\bdisarm(?:s|ed|ing)?\b",
+    'hex': r"\bhex(?:es|ed)?\b",
+    'fear': r"\bfear(?:s|ed)?\b",
+    'taunt': r"\btaunt(?:s|ed|ing)?\b",
+    'sleep': r"\bsleep(?:s)?\b|\basleep\b",
+    'break': r"\bbreak\b|\bpassives? (?:are )?disabled\b",
+    'dispel': r"\bdispel(?:s|led|ling)?\b|\bpurge",
+    'banish': r"\bbanish(?:es|ed)?\b",
+    'invisibility': r"\binvisib(?:le|ility)\b",
+    'heal': r"\bheal(?:s|ed|ing)?\b|\brestores? health\b",
+    'lifesteal': r"\blifesteal\b",
+    'shield': r"\bshield\b|\bbarrier\b",
+    'mana_burn': r"\bburns?(?:\W+\w+){0,3}?\W+mana\b|\bmana burn\b",
+    'illusion': r"\billusions?\b",
+    'summon': r"\bsummon(?:s|ed)?\b",
+    'teleport': r"\bteleport(?:s|ation)?\b|\bblink(?:s)?\b",
+    'knockback': r"\bknock(?:s|ed)? back\b|\bknockback\b|\bpush(?:es)?\b",
+    'pull': r"\bpull(?:s|ed)?\b",
+    'evasion': r"\bevasion\b|\bevade\b",
+    'true_strike': r"\btrue strike\b|\bcannot miss\b",
+    'pierces_debuff_immunity': r"pierces? (?:spell|debuff) immunity",
+    'spell_immunity': r"\b(?:spell|debuff) immunity\b",
+    'invulnerable': r"\binvulnerab(?:le|ility)\b",
+    'critical_strike': r"\bcritical\b",
+    'bash': r"\bbash(?:es)?\b",
+}
+EFFECT_PATTERNS = {keyword: re.compile(pattern, re.IGNORECASE) for keyword, pattern in EFFECT_KEYWORDS.items()}
+# the phrasings naming an effect without the ability applying it e.g. the wiki note "Disabled by Break" on the
+# passives, they are removed from the text before the keyword is looked for
+EFFECT_EXCLUSIONS = {
+    'break': r"\b(?:disabled|not disabled|affected|unaffected) by break\b",
+    'spell_immunity': r"\b(?:pierces?|pierced|pierce|blocked by|ignores?|through) (?:spell|debuff) immunity\b",
+}
+EXCLUSION_PATTERNS = {keyword: re.compile(pattern, re.IGNORECASE) for keyword, pattern in EFFECT_EXCLUSIONS.items()}
+SENTENCE_SEPARATOR = re.compile(r"(?<=[.!?;])\s+|\n+")
+VALUE_SEPARATOR = re.compile(r"\s*(?:,|/| or | and )\s*")
+MAX_RESULTS = 50
+
+
+def normalize_property(value: str) -> str:
+    """
+    Normalizes a property e.g. "Damage Type: Magical" -> "damage_type:magical" or "Stun" -> "stun"
+    :param value: the property
+    :return:
+    """
+    return ':'.join(normalize_name(part) for part in value.split(':', 1))
+
+
+def ability_properties(ability: Dict) -> Set[str]:
+    """
+    Extracts the normalized properties of an ability scraped by `process_spellcard_wrapper`, the
+    `.spelltad` labels and values, the traits, and the effect keywords found in the texts
+    :param ability: the ability data
+    :return:
+    """
+    properties = set()
+    for label, value in (ability.get('metadata') or {}).items():
+        key = normalize_name(label)
+        if not key:
+            continue
+        properties.add(key)
+        for part in VALUE_SEPARATOR.split(value or ''):
+            part = normalize_name(part)
+            if part:
+                properties.update({part, f"{key}:{part}"})
+    for label, value in (ability.get('traits') or {}).items():
+        key = normalize_name(label)
+        if not key:
+            continue
+        properties.add(key)
+        # only the textual traits e.g. "Dispellable: Strong Dispels Only" are values worth indexing
+        if value and not re.search(r"\d", value):
+            properties.add(f"{key}:{normalize_name(value)}")
+
+    texts = [ability.get('description') or '', *(ability.get('extra_descriptions') or []),
+             *(ability.get('traits') or {}).keys(), *(ability.get('traits') or {}).values(),
+             *(ability.get('metadata') or {}).values()]
+    # the keywords are looked for in each sentence of each field so that a pattern never spans two of them
+    sentences = [sentence for text in texts for sentence in SENTENCE_SEPARATOR.split(str(text)) if sentence]
+    for keyword, pattern in EFFECT_PATTERNS.items():
+        exclusion = EXCLUSION_PATTERNS.get(keyword)
+        if any(pattern.search(exclusion.sub(' ', sentence) if exclusion else sentence) for sentence in sentences):
+            properties.add(keyword)
+    return properties
+
+
+class AbilityPostings(NamedTuple):
+    abilities: List[Tuple[str, str, str]]
+    postings: Dict[str, Set[int]]
+
+
+def build_ability_postings(heroes: Dict[str, Dict]) -> AbilityPostings:
+    abilities = []
+    postings = {}
+    for hero_name in sorted(heroes):
+        hero = heroes[hero_name]
+        hero_abilities = list(hero.get('abilities') or [])
+        if hero.get('innate'):
+            hero_abilities.append(hero['innate'])
+        for ability in hero_abilities:
+            if not ability.get('name'):
+                continue
+            ability_id = len(abilities)
+            abilities.append((hero_name, ability['name'], ability.get('description') or ''))
+            for ability_property in ability_properties(ability):
+                postings.setdefault(ability_property, set()).add(ability_id)
+    return AbilityPostings(abilities, postings)
+
+
+class AbilityIndex:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.index = build_ability_postings(HeroDB().heroes)
+        # rebuild the postings when the hero data is hot-reloaded
+        HeroDB().subscribe(lambda changed_heroes: self.rebuild())
+        self._initialized = True
+
+    def rebuild(self) -> None:
+        self.index = build_ability_postings(HeroDB().heroes)
+
+    def find(self, properties: List[str]) -> Dict:
+        """
+        Retrieves the (hero, ability) pairs having all the given properties
+        :param properties: the properties e.g. ["stun", "damage_type:magical", "pierces_debuff_immunity"]
+        :return:
+        """
+        index = self.index
+        terms = [normalize_property(ability_property) for ability_property in properties]
+        unknown = [term for term in terms if term not in index.postings]
+        if unknown:
+            return {
+                'error': f"Unknown properties {unknown}",
+                'suggestions': sorted({
+                    suggestion for term in unknown
+                    for suggestion in difflib.get_close_matches(term, index.postings, n=5, cutoff=0.6)
+                } | {term for term in index.postings if any(part in term for part in unknown)})[:20]
+            }
+
+        # intersect from the rarest property so that the intermediate sets stay small
+        postings = sorted((index.postings[term] for term in terms), key=len)
+        ability_ids = set.intersection(*postings) if postings else set()
+        return {
+            'count': len(ability_ids),
+            'abilities': [
+                {'hero': hero_name, 'ability': ability_name, 'description': description}
+                for hero_name, ability_name, description in (index.abilities[i] for i in sorted(ability_ids)[:MAX_RESULTS])
+            ]
+        }
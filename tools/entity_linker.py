@@ -0,0 +1,242 @@
+import os
+import re
+import glob
+import json
+from collections import deque
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+
+from constants import MECHANICS_DATA_PATH, MECHANICS_TITLES_FILE
+from custom_logger.custom_logger import ChatDota2Logger
+
+logger = ChatDota2Logger()
+
+# shorter terms e.g. "HP" match inside too many unrelated words
+MIN_TERM_LENGTH = 3
+MAX_DEFINITION_CHARS = 300
+MAX_DEFINITIONS = 8
+PARENTHESES_PATTERN = re.compile(r"\s*\(([^)]*)\)\s*")
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton finding all the occurrences of a set of terms in a single pass over the text
+    """
+
+    def __init__(self, terms: Dict[str, str]):
+        """
+        :param terms: the lowercase terms and the value reported for each of them
+        """
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # (term length, value) of every term ending at the state, including the ones reached by the fail links
+        self.outputs: List[List[Tuple[int, str]]] = [[]]
+        for term, value in terms.items():
+            state = 0
+            for char in term:
+                if char not in self.transitions[state]:
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.transitions[state][char] = len(self.transitions) - 1
+                state = self.transitions[state][char]
+            self.outputs[state].append((len(term), value))
+
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.transitions[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.transitions[fail].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Finds the occurrences of the terms in the text
+        :param text: the lowercase text
+        :return: the (start, end, value) of every occurrence
+        """
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.transitions[state]:
+                state = self.fail[state]
+            state = self.transitions[state].get(char, 0)
+            for length, value in self.outputs[state]:
+                matches.append((position + 1 - length, position + 1, value))
+        return matches
+
+    def find_words(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Finds the whole-word occurrences of the terms in the text, keeping the leftmost longest ones
+        :param text: the lowercase text
+        :return: the (start, end, value) of the kept occurrences in order
+        """
+        matches = sorted(self.find(text), key=lambda match: (match[0], match[0] - match[1]))
+        kept = []
+        covered_until = 0
+        for start, end, value in matches:
+            if start < covered_until:
+                continue
+            if (start > 0 and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum()):
+                continue
+            kept.append((start, end, value))
+            covered_until = end
+        return kept
+
+
+def term_variants(title: str) -> List[str]:
+    """
+    Builds the lowercase terms matching a mechanic title e.g. "Head-up display (HUD)" ->
+    ["head-up display (hud)", "head-up display", "hud"] and their plural forms
+    :param title: the mechanic title
+    :return:
+    """
+    variants = {title, PARENTHESES_PATTERN.sub(' ', title).strip()}
+    variants.update(inner.strip() for inner in PARENTHESES_PATTERN.findall(title))
+    terms = set()
+    for variant in variants:
+        variant = variant.lower()
+        if len(variant) < MIN_TERM_LENGTH:
+            continue
+        terms.add(variant)
+        if variant.endswith('y'):
+            terms.add(variant[:-1] + 'ies')
+        elif not variant.endswith('s'):
+            terms.add(variant + 's')
+    return sorted(terms)
+
+
+def load_mechanic_terms(path: str = MECHANICS_DATA_PATH) -> Dict[str, str]:
+    """
+    Loads the terms naming the mechanics, the titles and sub titles persisted by
+    `MechanicsScraper.scrape_mechanics` from `get_all_mechanics_titles` and the titles of the mechanic pages.
+    The sub titles without a page of their own are aliases of their main mechanic
+    :param path: the directory of the mechanic pages
+    :return: the terms and the mechanic id, the page title, they link to
+    """
+    pages = {os.path.splitext(os.path.basename(file))[0] for file in glob.glob(os.path.join(path, '*.md'))}
+    terms = {}
+    titles_path = os.path.join(path, MECHANICS_TITLES_FILE)
+    if os.path.exists(titles_path):
+        with open(titles_path) as titles_file:
+            mechanic_titles = json.load(titles_file)
+        for category_dict in mechanic_titles:
+            for mechanic_list in category_dict.values():
+                for mechanics_dict in mechanic_list:
+                    for main_mechanic_title, sub_mechanic_titles in mechanics_dict.items():
+                        if main_mechanic_title not in pages:
+                            continue
+                        for title in [main_mechanic_title, *sub_mechanic_titles]:
+                            mechanic_id = title if title in pages else main_mechanic_title
+                            for term in term_variants(title):
+                                terms.setdefault(term, mechanic_id)
+    # the page titles win over the aliases
+    for page in pages:
+        for term in term_variants(page):
+            terms[term] = page
+    return terms
+
+
+def load_definition(path: str, mechanic_id: str) -> str:
+    """
+    Extracts the short definition of a mechanic, the first text paragraph of its page
+    :param path: the directory of the mechanic pages
+    :param mechanic_id: the mechanic page title
+    :return:
+    """
+    with open(os.path.join(path, f"{mechanic_id}.md")) as mechanic_file:
+        text = mechanic_file.read()
+    for paragraph in text.split('\n\n'):
+        paragraph = ' '.join(paragraph.split())
+        if paragraph and not paragraph.startswith(('#', '|', '>')):
+            if len(paragraph) > MAX_DEFINITION_CHARS:
+                paragraph = paragraph[:MAX_DEFINITION_CHARS].rsplit(' ', 1)[0] + '...'
+            return paragraph
+    return ''
+
+
+def ordered_union(lists: Iterable[List[str]]) -> List[str]:
+    return list(dict.fromkeys(value for values in lists for value in values))
+
+
+class MechanicsLinker:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.terms = load_mechanic_terms()
+        self.automaton = AhoCorasick(self.terms)
+        self.definitions = {}
+        for mechanic_id in set(self.terms.values()):
+            try:
+                self.definitions[mechanic_id] = load_definition(MECHANICS_DATA_PATH, mechanic_id)
+            except OSError as err:
+                logger.warning("Could not load the definition of %s: %s", mechanic_id, err)
+        logger.info("Built the mechanics linker with %s terms", len(self.terms))
+
+        self._initialized = True
+
+    def link(self, text: str) -> List[str]:
+        """
+        Finds the mechanics mentioned in a text, keeping the leftmost longest whole-word matches
+        :param text: the text e.g. an ability description
+        :return: the mechanic ids in order of appearance
+        """
+        matches = self.automaton.find_words((text or '').lower())
+        return list(dict.fromkeys(mechanic_id for _, _, mechanic_id in matches))
+
+    def link_ability(self, ability: Dict) -> List[str]:
+        """
+        Stores the mechanics mentioned by a hero or item ability under its `mechanics` key
+        :param ability: the ability data
+        :return: the linked mechanic ids
+        """
+        texts = [ability.get('description') or '', *(ability.get('extra_descriptions') or []),
+                 *(ability.get('notes') or []), *(ability.get('traits') or {}).keys(),
+                 *(ability.get('traits') or {}).values()]
+        ability['mechanics'] = self.link('\n'.join(texts))
+        return ability['mechanics']
+
+    def link_hero(self, hero: Dict) -> None:
+        """
+        Links the mechanics mentioned by the abilities of a hero, the union is stored under `mechanics`
+        :param hero: the hero data
+        :return:
+        """
+        abilities = list(hero.get('abilities') or [])
+        if hero.get('innate'):
+            abilities.append(hero['innate'])
+        hero['mechanics'] = ordered_union(self.link_ability(ability) for ability in abilities)
+
+    def link_item(self, item: Dict) -> None:
+        """
+        Links the mechanics mentioned by the abilities of an item, the union is stored under `mechanics`
+        :param item: the item record
+        :return:
+        """
+        item['mechanics'] = ordered_union(self.link_ability(ability) for ability in item['abilities'])
+
+    def get_definitions(self, mechanic_ids: List[str], limit: int = MAX_DEFINITIONS) -> Dict[str, str]:
+        """
+        Retrieves the short definitions of the linked mechanics
+        :param mechanic_ids: the mechanic ids
+        :param limit: the maximum number of definitions
+        :return:
+        """
+        mechanic_ids = [mechanic_id for mechanic_id in mechanic_ids if self.definitions.get(mechanic_id)]
+        return {mechanic_id: self.definitions[mechanic_id] for mechanic_id in mechanic_ids[:limit]}
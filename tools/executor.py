@@ -0,0 +1,58 @@
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from langchain_core.messages import ToolMessage
+
+from constants import TOOL_TIMEOUT_SECONDS, TOOL_WORKERS
+from custom_logger.custom_logger import ChatDota2Logger
+from tools import tools_mapping
+
+logger = ChatDota2Logger()
+
+# the tools are synchronous and some of them load data on their first call, running them on a bounded
+# pool keeps the event loop, and so every other chat session of the worker, responsive
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix='tool')
+
+
+def serialize_result(result) -> str:
+    """
+    Serializes a tool result into the content of a ToolMessage
+    :param result: the value returned by the tool
+    :return:
+    """
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, ensure_ascii=False, default=str)
+
+
+async def run_tool_call(tool_call: Dict, timeout: float = TOOL_TIMEOUT_SECONDS) -> ToolMessage:
+    """
+    Runs one tool call on the tool executor, the errors and the timeouts are reported to the model
+    as the content of the ToolMessage instead of failing the whole response
+    :param tool_call: the tool call of the model with its name, args and id
+    :param timeout: the maximum number of seconds to wait for the tool
+    :return:
+    """
+    tool_name = tool_call['name']
+    tool_to_run = tools_mapping.get(tool_name)
+    if tool_to_run is None:
+        return ToolMessage(content=f"Unknown tool '{tool_name}'", tool_call_id=tool_call['id'], name=tool_name,
+                           status='error')
+
+    loop = asyncio.get_running_loop()
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(tool_executor, lambda: tool_to_run(**tool_call['args'])), timeout
+        )
+        return ToolMessage(content=serialize_result(result), tool_call_id=tool_call['id'], name=tool_name)
+    except asyncio.TimeoutError:
+        logger.error("The tool %s timed out after %s seconds", tool_name, timeout)
+        return ToolMessage(content=f"The tool '{tool_name}' timed out after {timeout} seconds",
+                           tool_call_id=tool_call['id'], name=tool_name, status='error')
+    except Exception as err:
+        logger.error("The following error occurred while running the tool %s: %s", tool_name, err)
+        return ToolMessage(content=f"The tool '{tool_name}' failed: {err}", tool_call_id=tool_call['id'],
+                           name=tool_name, status='error')
+
@@ -1,6 +1,15 @@
+import os
 import glob
 import json
 from threading import Lock
+from typing import Callable, Iterable, List
+
+from constants import HERO_DATA_PATH
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.entity_linker import MechanicsLinker
+
+logger = ChatDota2Logger()
+
 
 class HeroDB:
     _instance = None
@@ -19,9 +28,88 @@ class HeroDB:
             return
 
         self.heroes = {}
-        for file in glob.glob("hero_data/*"):
-            with open(file) as json_file:
-                hero_data = json.load(json_file)
-            self.heroes[hero_data['name']] = hero_data
+        # the mtime and the hero name of every loaded file, to only rebuild the changed records
+        self.files = {}
+        self.version = 0
+        self.listeners: List[Callable[[List[str]], None]] = []
+        self.watcher = None
+        self._reload_lock = Lock()
+        self.reload()
 
         self._initialized = True
+
+    def reload(self, paths: Iterable[str] | None = None) -> List[str]:
+        """
+        Reloads the hero files that changed since the last load and publishes the new snapshot
+        with a copy-on-write swap, readers holding the previous `heroes` dict are never affected
+        :param paths: the paths reported as changed, all the files are checked if None
+        :return: the names of the heroes that changed
+        """
+        with self._reload_lock:
+            existing = set(glob.glob(os.path.join(HERO_DATA_PATH, '*')))
+            candidates = existing | set(self.files) if paths is None else set(paths)
+
+            heroes = None
+            files = dict(self.files)
+            changed_heroes = []
+            for path in sorted(candidates):
+                if path not in existing or not os.path.exists(path):
+                    if path in files:
+                        heroes = dict(self.heroes) if heroes is None else heroes
+                        hero_name = files.pop(path)[1]
+                        heroes.pop(hero_name, None)
+                        changed_heroes.append(hero_name)
+                    continue
+                mtime = os.path.getmtime(path)
+                if path in files and files[path][0] == mtime:
+                    continue
+                try:
+                    with open(path) as json_file:
+                        hero_data = json.load(json_file)
+                except (OSError, ValueError) as err:
+                    # the file is most probably still being written, the next event picks it up
+                    logger.warning("Could not load %s: %s", path, err)
+                    continue
+                MechanicsLinker().link_hero(hero_data)
+                heroes = dict(self.heroes) if heroes is None else heroes
+                if path in files and files[path][1] != hero_data['name']:
+                    heroes.pop(files[path][1], None)
+                heroes[hero_data['name']] = hero_data
+                files[path] = (mtime, hero_data['name'])
+                changed_heroes.append(hero_data['name'])
+
+            if heroes is None:
+                return []
+            self.heroes = heroes
+            self.files = files
+            self.version += 1
+
+        if self.version > 1:
+            logger.info("Reloaded the hero data of %s", ', '.join(changed_heroes))
+        for listener in self.listeners:
+            try:
+                listener(changed_heroes)
+            except Exception as err:
+                logger.error("The following error occurred while notifying a hero data listener: %s", err)
+        return changed_heroes
+
+    def subscribe(self, listener: Callable[[List[str]], None]) -> None:
+        """
+        Registers a callback called with the changed hero names after every reload, used by the
+        indices derived from the hero data to rebuild themselves
+        :param listener: the callback
+        :return:
+        """
+        self.listeners.append(listener)
+
+    def start_watching(self) -> None:
+        """
+        Starts the background watcher that hot-reloads the hero data when the files change
+        :return:
+        """
+        from tools.hero_watcher import HeroDataWatcher
+
+        with self._reload_lock:
+            if self.watcher is None:
+                self.watcher = HeroDataWatcher(self)
+                self.watcher.start()
@@ -0,0 +1,171 @@
+from threading import Lock
+from typing import Dict, List, NamedTuple
+
+from tools.entity_linker import MechanicsLinker
+from tools.hero_db import HeroDB
+from tools.hero_stats import ATTRIBUTES, primary_attribute
+from tools.tokens import count_tokens, register_token_counts
+
+# the ability fields rendered on their own line, in this order, the other fields are rendered after them
+ABILITY_FIELDS = ['metadata', 'description', 'traits', 'costs', 'extra_descriptions', 'tabs', 'mechanics']
+# the flavor texts the model never needs to answer a question
+SKIPPED_ABILITY_FIELDS = {'name', 'lore'}
+
+
+def is_empty(value) -> bool:
+    return value is None or (isinstance(value, (str, list, dict)) and not value)
+
+
+def clean_text(text: str) -> str:
+    return ' '.join(str(text).split())
+
+
+def render_pairs(values: Dict) -> str:
+    """
+    Renders a flat dict on one line e.g. "Radius: 315 | Duration: 2/2.4/2.8/3.2", the empty values are dropped
+    :param values: the dict
+    :return:
+    """
+    return ' | '.join(f"{label}: {clean_text(value)}" for label, value in values.items() if not is_empty(value))
+
+
+def render_ability(ability: Dict, heading: str) -> List[str]:
+    """
+    Renders a spellcard scraped by `process_spellcard_wrapper`, the tabs are flattened into one line each
+    :param ability: the ability data
+    :param heading: the heading of the ability e.g. "### 4. Culling Blade (ultimate)"
+    :return: the lines
+    """
+    lines = [heading]
+    for field in ABILITY_FIELDS + sorted(set(ability) - set(ABILITY_FIELDS) - SKIPPED_ABILITY_FIELDS):
+        value = ability.get(field)
+        if is_empty(value):
+            continue
+        if field == 'description':
+            lines.append(clean_text(value))
+        elif field == 'extra_descriptions':
+            lines.extend(f"- {clean_text(extra)}" for extra in value if not is_empty(extra))
+        elif field == 'tabs':
+            lines.extend(f"{title}: {clean_text(text)}" for title, text in value.items() if not is_empty(text))
+        elif field == 'hotkeys':
+            lines.append('Hotkey: ' + ', '.join(hotkey['key'] for hotkey in value if hotkey.get('key')))
+        elif field == 'mechanics':
+            lines.append('Mechanics: ' + ', '.join(value))
+        elif isinstance(value, dict):
+            lines.append(render_pairs(value))
+        elif isinstance(value, list):
+            lines.append(f"{field}: " + '; '.join(clean_text(item) for item in value if not is_empty(item)))
+        else:
+            lines.append(f"{field}: {clean_text(value)}")
+    return lines
+
+
+def render_hero(hero: Dict) -> str:
+    """
+    Renders a hero record into a compact and deterministic Markdown, the empty fields are dropped and
+    the nested structures are flattened into labelled lines
+    :param hero: the hero data written by `Hero.to_dict`
+    :return:
+    """
+    lines = [f"# {hero['name']}" + (f" - {clean_text(hero['title'])}" if not is_empty(hero.get('title')) else '')]
+    summary_info = hero.get('summary_info') or {}
+    lines.append(render_pairs({
+        'Roles': ', '.join(summary_info.get('roles') or []),
+        'Complexity': summary_info.get('complexity'),
+        'Main attribute': primary_attribute(hero),
+    }))
+    for label, field in [('Quote', 'quote'), ('Lore', 'lore_summary')]:
+        if not is_empty(hero.get(field)):
+            lines.append(f"{label}: {clean_text(hero[field])}")
+    if not is_empty(summary_info.get('summary')):
+        lines.append(f"Summary: {clean_text(summary_info['summary'])}")
+
+    basic_stats = dict(hero.get('basic_stats') or {})
+    attributes = basic_stats.pop('attributes', None) or {}
+    if basic_stats or attributes:
+        lines.append('## Basic stats')
+        lines.append(' | '.join(
+            f"{attribute}: {attributes[attribute].get('base_attribute')} +{attributes[attribute].get('attribute_gain')}"
+            for attribute in ATTRIBUTES if attributes.get(attribute)
+        ))
+        lines.append(render_pairs({label.replace('base_', ''): value for label, value in basic_stats.items()}))
+
+    abilities = list(hero.get('abilities') or [])
+    if abilities:
+        lines.append('## Abilities')
+        for position, ability in enumerate(abilities, start=1):
+            ultimate = ' (ultimate)' if position == len(abilities) else ''
+            lines.extend(render_ability(ability, f"### {position}. {ability.get('name', '')}{ultimate}"))
+    if not is_empty(hero.get('innate')):
+        lines.extend(render_ability(hero['innate'], f"## Innate: {hero['innate'].get('name', '')}"))
+    if not is_empty(hero.get('facets')):
+        lines.append('## Facets')
+        lines.extend(
+            f"- {facet_name}: {clean_text((facet or {}).get('description', ''))}"
+            for facet_name, facet in hero['facets'].items()
+        )
+    for label, field in [('Aghanim\'s Scepter', 'scepter_upgrade_info'), ('Aghanim\'s Shard', 'shard_upgrade_info')]:
+        if not is_empty(hero.get(field)):
+            lines.append(f"## {label}\n{clean_text(hero[field])}")
+    if not is_empty(hero.get('talent_tree')):
+        lines.append('## Talents')
+        lines.extend(
+            f"Level {level}: {clean_text(talents.get('left', ''))} / {clean_text(talents.get('right', ''))}"
+            for level, talents in hero['talent_tree'].items()
+        )
+
+    definitions = MechanicsLinker().get_definitions(hero.get('mechanics') or [])
+    if definitions:
+        lines.append('## Mechanics')
+        lines.extend(f"- {mechanic}: {definition}" for mechanic, definition in definitions.items())
+    return '\n'.join(line for line in lines if line)
+
+
+class RenderedHero(NamedTuple):
+    text: str
+    tokens: int
+
+
+class HeroRenderer:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.publish(self.render(HeroDB().heroes, HeroDB().heroes))
+        # only the changed heroes are rendered again when the hero data is hot-reloaded
+        HeroDB().subscribe(self.rebuild)
+        self._initialized = True
+
+    @staticmethod
+    def render(heroes: Dict[str, Dict], hero_names) -> Dict[str, RenderedHero]:
+        rendered = {}
+        for hero_name in hero_names:
+            if hero_name in heroes:
+                text = render_hero(heroes[hero_name])
+                rendered[hero_name] = RenderedHero(text, count_tokens(text))
+        return rendered
+
+    def publish(self, rendered: Dict[str, RenderedHero]) -> None:
+        self.rendered = rendered
+        # the get_hero results are counted against the history and the rate limits without encoding them again
+        register_token_counts('heroes', {hero.text: hero.tokens for hero in rendered.values()})
+
+    def rebuild(self, changed_heroes: List[str]) -> None:
+        heroes = HeroDB().heroes
+        rendered = {hero_name: hero for hero_name, hero in self.rendered.items() if hero_name in heroes}
+        rendered.update(self.render(heroes, changed_heroes))
+        self.publish(rendered)
+
+    def get(self, hero_name: str) -> RenderedHero | None:
+        return self.rendered.get(hero_name)
@@ -0,0 +1,168 @@
+import re
+from threading import Lock
+from typing import Dict, List, NamedTuple, get_args
+
+import numpy as np
+
+from constants import HERO_STATS, MAX_HERO_LEVEL
+from tools.hero_db import HeroDB
+
+NUMBER_PATTERN = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?")
+ATTRIBUTES = ['strength', 'agility', 'intelligence']
+STATS = list(get_args(HERO_STATS))
+DERIVED_STATS = STATS[len(ATTRIBUTES):]
+
+# the bonuses granted by one point of each attribute
+HEALTH_PER_STRENGTH = 22.0
+HEALTH_REGENERATION_PER_STRENGTH = 0.1
+ARMOR_PER_AGILITY = 1 / 6
+ATTACK_SPEED_PER_AGILITY = 1.0
+MANA_PER_INTELLIGENCE = 12.0
+MANA_REGENERATION_PER_INTELLIGENCE = 0.05
+DAMAGE_PER_PRIMARY_ATTRIBUTE = 1.0
+DAMAGE_PER_UNIVERSAL_ATTRIBUTE = 0.45
+
+
+def parse_number(value) -> float:
+    """
+    Parses the first number of a scraped stat e.g. "25", "2.6", "25%" or "100 (1.7s BAT)"
+    :param value: the scraped value
+    :return: the number, nan if there is none e.g. "n/a"
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.search(value or '')
+    return float(match.group()) if match else np.nan
+
+
+def parse_damage(basic_stats: Dict) -> float:
+    """
+    Parses the base damage range e.g. "55-59" into the average damage
+    :param basic_stats: the basic stats of the hero
+    :return:
+    """
+    damage_range = [float(number) for number in NUMBER_PATTERN.findall(basic_stats.get('base_damage') or '')]
+    if len(damage_range) >= 2:
+        return (damage_range[0] + damage_range[1]) / 2
+    return parse_number(basic_stats.get('base_average_damage'))
+
+
+def primary_attribute(hero: Dict) -> str:
+    """
+    Retrieves the primary attribute of the hero, "universal" when the hero has none or several of them
+    :param hero: the hero data
+    :return:
+    """
+    if hero.get('main_attribute'):
+        return hero['main_attribute'].lower()
+    attributes = (hero.get('basic_stats') or {}).get('attributes') or {}
+    primaries = [name for name, attribute in attributes.items() if attribute.get('type') == 'primary']
+    return primaries[0] if len(primaries) == 1 else 'universal'
+
+
+class StatsTable(NamedTuple):
+    heroes: List[str]
+    index: Dict[str, int]
+    # heroes x levels x STATS
+    values: np.ndarray
+
+
+def build_stats_table(heroes: Dict[str, Dict]) -> StatsTable:
+    """
+    Parses the basic stats of all the heroes and computes the heroes x levels x stats array in one
+    vectorized pass. The attributes at level L are base + gain * (L - 1), the attribute bonuses of the
+    talents and the level 17-30 bonus attribute points are not included
+    :param heroes: the hero data by hero name
+    :return:
+    """
+    names = sorted(heroes)
+    base_attributes = np.full((len(names), len(ATTRIBUTES)), np.nan)
+    attribute_gains = np.full((len(names), len(ATTRIBUTES)), np.nan)
+    base_stats = np.full((len(names), len(DERIVED_STATS)), np.nan)
+    # attribute point -> stat coefficients, only the damage depends on the hero
+    coefficients = np.zeros((len(names), len(ATTRIBUTES), len(DERIVED_STATS)))
+    strength, agility, intelligence = range(len(ATTRIBUTES))
+    coefficients[:, strength, DERIVED_STATS.index('health')] = HEALTH_PER_STRENGTH
+    coefficients[:, strength, DERIVED_STATS.index('health_regeneration')] = HEALTH_REGENERATION_PER_STRENGTH
+    coefficients[:, agility, DERIVED_STATS.index('armor')] = ARMOR_PER_AGILITY
+    coefficients[:, agility, DERIVED_STATS.index('attack_speed')] = ATTACK_SPEED_PER_AGILITY
+    coefficients[:, intelligence, DERIVED_STATS.index('mana')] = MANA_PER_INTELLIGENCE
+    coefficients[:, intelligence, DERIVED_STATS.index('mana_regeneration')] = MANA_REGENERATION_PER_INTELLIGENCE
+
+    for row, name in enumerate(names):
+        basic_stats = heroes[name].get('basic_stats') or {}
+        attributes = basic_stats.get('attributes') or {}
+        for column, attribute in enumerate(ATTRIBUTES):
+            base_attributes[row, column] = parse_number((attributes.get(attribute) or {}).get('base_attribute'))
+            attribute_gains[row, column] = parse_number((attributes.get(attribute) or {}).get('attribute_gain'))
+        base_stats[row] = [
+            parse_number(basic_stats.get('base_health')),
+            parse_number(basic_stats.get('base_health_regeneration')),
+            parse_number(basic_stats.get('base_mana')),
+            parse_number(basic_stats.get('base_mana_regeneration')),
+            parse_number(basic_stats.get('base_armor')),
+            parse_damage(basic_stats),
+            parse_number(basic_stats.get('attack_speed')),
+        ]
+        primary = primary_attribute(heroes[name])
+        if primary in ATTRIBUTES:
+            coefficients[row, ATTRIBUTES.index(primary), DERIVED_STATS.index('damage')] = DAMAGE_PER_PRIMARY_ATTRIBUTE
+        else:
+            coefficients[row, :, DERIVED_STATS.index('damage')] = DAMAGE_PER_UNIVERSAL_ATTRIBUTE
+
+    levels = np.arange(MAX_HERO_LEVEL)
+    # heroes x levels x attributes, the attributes gained since level 1
+    attribute_deltas = attribute_gains[:, None, :] * levels[None, :, None]
+    attributes_by_level = base_attributes[:, None, :] + attribute_deltas
+    derived_by_level = base_stats[:, None, :] + np.einsum('hla,has->hls', attribute_deltas, coefficients)
+    values = np.concatenate([attributes_by_level, derived_by_level], axis=2)
+    return StatsTable(names, {name: row for row, name in enumerate(names)}, values)
+
+
+class HeroStats:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.table = build_stats_table(HeroDB().heroes)
+        # rebuild the table when the hero data is hot-reloaded
+        HeroDB().subscribe(lambda changed_heroes: self.rebuild())
+        self._initialized = True
+
+    def rebuild(self) -> None:
+        self.table = build_stats_table(HeroDB().heroes)
+
+    def get(self, hero_name: str, levels: List[int] | None = None, stats: List[str] | None = None) -> Dict | None:
+        """
+        Retrieves the stats of a hero at the given levels
+        :param hero_name: the hero key e.g. "axe"
+        :param levels: the levels between 1 and 30, all of them if None
+        :param stats: the stats to retrieve, all of them if None
+        :return:
+        """
+        table = self.table
+        if hero_name not in table.index:
+            return None
+        levels = [level for level in (levels or range(1, MAX_HERO_LEVEL + 1)) if 1 <= level <= MAX_HERO_LEVEL]
+        stats = [stat for stat in (stats or STATS) if stat in STATS]
+        values = table.values[table.index[hero_name]][np.ix_(
+            [level - 1 for level in levels], [STATS.index(stat) for stat in stats]
+        )]
+        return {
+            'hero': hero_name,
+            'levels': {
+                level: {stat: (None if np.isnan(value) else round(float(value), 2)) for stat, value in zip(stats, row)}
+                for level, row in zip(levels, values)
+            }
+        }
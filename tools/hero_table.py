@@ -0,0 +1,172 @@
+import re
+from threading import Lock
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+from tools.hero_db import HeroDB
+from tools.hero_stats import ATTRIBUTES, parse_damage, parse_number, primary_attribute
+
+CLAUSE_SEPARATOR = re.compile(r"\s+and\s+", re.IGNORECASE)
+CLAUSE_PATTERN = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|>|<|=|has)\s*(.+?)\s*$", re.IGNORECASE)
+# the scraper only extracts the attack range of the melee heroes
+MELEE_MAX_ATTACK_RANGE = 200
+COMPARISONS = {
+    '==': np.equal, '=': np.equal, '!=': np.not_equal,
+    '>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+}
+
+
+class HeroTable(NamedTuple):
+    heroes: np.ndarray
+    numeric: Dict[str, np.ndarray]
+    text: Dict[str, np.ndarray]
+    # heroes x roles membership matrix
+    roles: np.ndarray
+    role_names: List[str]
+
+    @property
+    def columns(self) -> List[str]:
+        return sorted(list(self.numeric) + list(self.text) + ['roles'])
+
+
+def build_hero_table(heroes: Dict[str, Dict]) -> HeroTable:
+    """
+    Builds the columnar table of all the heroes, one float column per parsed `basic_stats` field, the
+    attributes and their gains, the main attribute, the attack type and the roles membership matrix
+    :param heroes: the hero data by hero name
+    :return:
+    """
+    names = sorted(heroes)
+    numeric_fields = sorted({
+        field for hero in heroes.values() for field in (hero.get('basic_stats') or {}) if field != 'attributes'
+    })
+    numeric = {field: np.full(len(names), np.nan) for field in numeric_fields}
+    for attribute in ATTRIBUTES:
+        numeric[f"base_{attribute}"] = np.full(len(names), np.nan)
+        numeric[f"{attribute}_gain"] = np.full(len(names), np.nan)
+    numeric['complexity'] = np.full(len(names), np.nan)
+    text = {
+        'main_attribute': np.empty(len(names), dtype=object),
+        'attack_type': np.empty(len(names), dtype=object),
+    }
+    role_names = sorted({
+        role.lower() for hero in heroes.values() for role in (hero.get('summary_info') or {}).get('roles', [])
+    })
+    roles = np.zeros((len(names), len(role_names)), dtype=bool)
+
+    for row, name in enumerate(names):
+        hero = heroes[name]
+        basic_stats = hero.get('basic_stats') or {}
+        for field in numeric_fields:
+            numeric[field][row] = parse_damage(basic_stats) if field == 'base_damage' else parse_number(basic_stats.get(field))
+        for attribute in ATTRIBUTES:
+            attribute_stats = (basic_stats.get('attributes') or {}).get(attribute) or {}
+            numeric[f"base_{attribute}"][row] = parse_number(attribute_stats.get('base_attribute'))
+            numeric[f"{attribute}_gain"][row] = parse_number(attribute_stats.get('attribute_gain'))
+        summary_info = hero.get('summary_info') or {}
+        numeric['complexity'][row] = parse_number(summary_info.get('complexity'))
+        text['main_attribute'][row] = primary_attribute(hero)
+        attack_range = parse_number(basic_stats.get('attack_range'))
+        text['attack_type'][row] = 'melee' if attack_range <= MELEE_MAX_ATTACK_RANGE else 'ranged'
+        for role in summary_info.get('roles', []):
+            roles[row, role_names.index(role.lower())] = True
+
+    return HeroTable(np.array(names, dtype=object), numeric, text, roles, role_names)
+
+
+def parse_filter(table: HeroTable, filter_expression: str) -> np.ndarray:
+    """
+    Evaluates a filter expression e.g. "main_attribute == agility and roles has carry and day_movement_speed > 300"
+    into a boolean mask over the heroes, one vectorized comparison per clause
+    :param table: the hero table
+    :param filter_expression: the clauses joined by "and"
+    :return:
+    """
+    mask = np.ones(len(table.heroes), dtype=bool)
+    for clause in CLAUSE_SEPARATOR.split(filter_expression.strip()) if filter_expression.strip() else []:
+        match = CLAUSE_PATTERN.match(clause)
+        if not match:
+            raise ValueError(f"Could not parse the filter clause '{clause}', expected `<column> <operator> <value>`")
+        column, operator, value = match.group(1).lower(), match.group(2).lower(), match.group(3).strip('\'" ').lower()
+        if column == 'roles':
+            if operator not in ('has', '==', '='):
+                raise ValueError("The roles can only be filtered with `roles has <role>`")
+            if value not in table.role_names:
+                raise ValueError(f"Unknown role '{value}', the roles are {table.role_names}")
+            mask &= table.roles[:, table.role_names.index(value)]
+        elif column in table.numeric:
+            if operator == 'has':
+                raise ValueError("`has` can only be used with the roles")
+            with np.errstate(invalid='ignore'):
+                mask &= COMPARISONS[operator](table.numeric[column], parse_number(value))
+        elif column in table.text:
+            if operator not in ('==', '=', '!='):
+                raise ValueError(f"{column} can only be compared with == or !=")
+            mask &= COMPARISONS[operator](table.text[column], value)
+        else:
+            raise ValueError(f"Unknown column '{column}'")
+    return mask
+
+
+class HeroRanking:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.table = build_hero_table(HeroDB().heroes)
+        # rebuild the table when the hero data is hot-reloaded
+        HeroDB().subscribe(lambda changed_heroes: self.rebuild())
+        self._initialized = True
+
+    def rebuild(self) -> None:
+        self.table = build_hero_table(HeroDB().heroes)
+
+    def rank(self, filter_expression: str = '', sort_by: str | None = None, k: int = 10,
+             descending: bool = True) -> Dict:
+        """
+        Filters the heroes and ranks them by a numeric column
+        :param filter_expression: the clauses joined by "and" e.g. "attack_type == melee and day_movement_speed > 300"
+        :param sort_by: the numeric column to rank the heroes by, the heroes are sorted by name if None
+        :param k: the number of heroes to return
+        :param descending: whether to rank from the highest value
+        :return:
+        """
+        table = self.table
+        try:
+            mask = parse_filter(table, filter_expression or '')
+            if sort_by and sort_by not in table.numeric:
+                raise ValueError(f"Unknown numeric column '{sort_by}'")
+        except ValueError as err:
+            return {'error': str(err), 'columns': table.columns}
+
+        ids = np.flatnonzero(mask)
+        if sort_by:
+            values = table.numeric[sort_by][ids]
+            # the heroes without the stat are left out of the ranking
+            present = ~np.isnan(values)
+            ids, values = ids[present], values[present]
+            ids = ids[np.argsort(-values if descending else values, kind='stable')]
+        filter_words = set(re.findall(r"\w+", (filter_expression or '').lower()))
+        referenced = [column for column in table.numeric if column == sort_by or column in filter_words]
+        rows = []
+        for i in ids[:k]:
+            row = {'hero': table.heroes[i], 'main_attribute': table.text['main_attribute'][i],
+                   'attack_type': table.text['attack_type'][i]}
+            row.update({
+                column: None if np.isnan(table.numeric[column][i]) else round(float(table.numeric[column][i]), 2)
+                for column in referenced
+            })
+            rows.append(row)
+        return {'count': int(mask.sum()), 'heroes': rows}
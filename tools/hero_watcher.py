@@ -0,0 +1,107 @@
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+from threading import Thread, Event
+from typing import Set
+
+from constants import HERO_DATA_PATH, HERO_DATA_POLL_INTERVAL
+from custom_logger.custom_logger import ChatDota2Logger
+
+logger = ChatDota2Logger()
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+EVENT_HEADER = struct.Struct('iIII')
+# wait for the burst of events of a rescrape to settle before reloading
+DEBOUNCE_SECONDS = 0.5
+
+
+class HeroDataWatcher(Thread):
+    """
+    Watches the hero data directory and hot-reloads the changed files into the HeroDB. Uses inotify
+    on Linux and falls back to polling the mtimes every `HERO_DATA_POLL_INTERVAL` seconds otherwise
+    """
+
+    def __init__(self, hero_db, path: str = HERO_DATA_PATH):
+        super().__init__(name='HeroDataWatcher', daemon=True)
+        self.hero_db = hero_db
+        self.path = path
+        self.stopped = Event()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def run(self) -> None:
+        fd = self.init_inotify()
+        if fd is None:
+            logger.info("Watching %s for changes by polling every %s seconds", self.path, HERO_DATA_POLL_INTERVAL)
+            self.poll()
+        else:
+            logger.info("Watching %s for changes with inotify", self.path)
+            try:
+                self.watch(fd)
+            finally:
+                os.close(fd)
+
+    def init_inotify(self) -> int | None:
+        """
+        Initializes an inotify instance watching the hero data directory
+        :return: the inotify file descriptor, None if inotify is not available
+        """
+        library = ctypes.util.find_library('c')
+        if library is None or not os.path.isdir(self.path):
+            return None
+        try:
+            libc = ctypes.CDLL(library, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.path), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def watch(self, fd: int) -> None:
+        changed_paths: Set[str] = set()
+        last_event = 0.0
+        while not self.stopped.is_set():
+            readable, _, _ = select.select([fd], [], [], DEBOUNCE_SECONDS)
+            if readable:
+                try:
+                    buffer = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset < len(buffer):
+                    _, _, _, name_length = EVENT_HEADER.unpack_from(buffer, offset)
+                    offset += EVENT_HEADER.size
+                    name = buffer[offset:offset + name_length].rstrip(b'\0').decode()
+                    offset += name_length
+                    if name:
+                        changed_paths.add(os.path.join(self.path, name))
+                last_event = time.monotonic()
+            elif changed_paths and time.monotonic() - last_event >= DEBOUNCE_SECONDS:
+                self.reload(changed_paths)
+                changed_paths = set()
+
+    def poll(self) -> None:
+        while not self.stopped.wait(HERO_DATA_POLL_INTERVAL):
+            self.reload(None)
+
+    def reload(self, paths: Set[str] | None) -> None:
+        try:
+            self.hero_db.reload(paths)
+        except Exception as err:
+            logger.error("failed to reload the hero data")
+            logger.error("The following error occurred: %s", err)
@@ -0,0 +1,184 @@
+import os
+import re
+import glob
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from constants import ITEMS_DATA_PATH, ITEM_CATEGORIES
+from tools.entity_linker import MechanicsLinker
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*$")
+TABLE_ROW_PATTERN = re.compile(r"^\|\s*(.*?)\s*\|\s*(.*?)\s*\|\s*$")
+COST_LABEL_PATTERN = re.compile(r"cost|gold|sell|bought", re.IGNORECASE)
+RECIPE_LABELS = {'builds from', 'upgrades into'}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes an entity name to the snake case form used for lookups
+    e.g. "Aghanim's Scepter" -> "aghanims_scepter"
+    :param name: the name to normalize
+    :return:
+    """
+    name = (name or '').lower().replace("'", '').replace('’', '')
+    return re.sub(r"[^a-z0-9]+", '_', name).strip('_')
+
+
+def parse_property_table(lines: List[str]) -> Dict[str, str]:
+    """
+    Parses the `| Property | Value |` tables rendered by the items scraper into a dict,
+    skipping the header, the separator and the italic section rows
+    :param lines: the lines of the table
+    :return:
+    """
+    properties = {}
+    for line in lines:
+        match = TABLE_ROW_PATTERN.match(line)
+        if not match:
+            continue
+        label, value = match.groups()
+        if label in ('Property', '---') or (label.startswith('*') and not value):
+            continue
+        properties[label] = value
+    return properties
+
+
+def split_markdown_blocks(text: str) -> List[Tuple[int, str, List[str]]]:
+    """
+    Splits the Markdown text into (heading level, heading title, body lines) blocks, the text
+    before the first heading is returned with level 0 and an empty title
+    :param text: the Markdown text
+    :return:
+    """
+    blocks = [(0, '', [])]
+    for line in text.splitlines():
+        match = HEADING_PATTERN.match(line)
+        if match:
+            blocks.append((len(match.group(1)), match.group(2), []))
+        else:
+            blocks[-1][2].append(line)
+    return [block for block in blocks if block[1] or any(line.strip() for line in block[2])]
+
+
+def parse_ability_block(title: str, lines: List[str]) -> Dict:
+    """
+    Parses a spellcard block rendered by `convert_spellcard_to_md` into an ability dict
+    :param title: the name of the ability
+    :param lines: the body lines of the block
+    :return:
+    """
+    description = next((line[2:].strip() for line in lines if line.startswith('> ')), '')
+    properties = parse_property_table(lines)
+    notes = [line[2:].strip() for line in lines if line.startswith('- ')]
+    ability_type = ' '.join([properties.get('Ability', '')] + [
+        line for line in lines if line.startswith('*Restrictions:*')
+    ])
+    return {
+        'name': title,
+        'type': 'passive' if 'passive' in ability_type.lower() else 'active',
+        'description': description,
+        'properties': properties,
+        'notes': notes,
+    }
+
+
+def parse_item_markdown(name: str, category: str, text: str) -> Dict:
+    """
+    Parses the Markdown of an item page produced by `ItemsScraper.scrape_all_items` into a
+    record with the infobox properties, the abilities (active/passive) and the remaining sections
+    :param name: the name of the item
+    :param category: the category of the item e.g. shop_items
+    :param text: the Markdown text of the item page
+    :return:
+    """
+    item = {
+        'name': name,
+        'category': category,
+        'flavor': '',
+        'properties': {},
+        'abilities': [],
+        'sections': {},
+    }
+    for level, title, lines in split_markdown_blocks(text):
+        is_table = any(TABLE_ROW_PATTERN.match(line) for line in lines)
+        if not item['properties'] and is_table and level <= 3:
+            # the infobox is processed first by the scraper so the first table holds the item stats
+            item['properties'] = parse_property_table(lines)
+            item['flavor'] = next((line[2:].strip() for line in lines if line.startswith('> ')), '')
+        elif level == 4 and (is_table or any(line.startswith('> ') for line in lines)):
+            item['abilities'].append(parse_ability_block(title, lines))
+        else:
+            body = '\n'.join(lines).strip()
+            if body:
+                item['sections'][title or 'Overview'] = body
+    return item
+
+
+def project_item(item: Dict, sections: List[str]) -> Dict:
+    """
+    Projects the item record on the requested sections only
+    :param item: the item record
+    :param sections: the sections to keep e.g. ['cost', 'recipe']
+    :return:
+    """
+    projected = {'name': item['name'], 'category': item['category']}
+    for section in sections:
+        if section == 'cost':
+            projected['cost'] = {
+                label: value for label, value in item['properties'].items() if COST_LABEL_PATTERN.search(label)
+            }
+        elif section == 'recipe':
+            projected['recipe'] = {
+                label: value for label, value in item['properties'].items() if label.lower() in RECIPE_LABELS
+            }
+            projected['recipe'].update({
+                title: body for title, body in item['sections'].items() if 'recipe' in title.lower()
+            })
+        elif section in ('active', 'passive'):
+            projected[section] = [ability for ability in item['abilities'] if ability['type'] == section]
+        elif section in item:
+            projected[section] = item[section]
+    return projected
+
+
+class ItemDB:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.items = {}
+        self.categories = {category: [] for category in ITEM_CATEGORIES}
+        for category in ITEM_CATEGORIES:
+            for file in sorted(glob.glob(os.path.join(ITEMS_DATA_PATH, category, '*.md'))):
+                with open(file) as item_file:
+                    text = item_file.read()
+                name = os.path.splitext(os.path.basename(file))[0]
+                key = normalize_name(name)
+                self.items[key] = parse_item_markdown(name, category, text)
+                MechanicsLinker().link_item(self.items[key])
+                self.categories[category].append(key)
+
+        self._initialized = True
+
+    def get(self, item_name: str, sections: List[str] | None = None) -> Dict | None:
+        """
+        Retrieves an item by name, optionally projected on the given sections
+        :param item_name: the name of the item in any casing e.g. "Black King Bar" or "black_king_bar"
+        :param sections: the sections to return, all of them if None
+        :return:
+        """
+        item = self.items.get(normalize_name(item_name))
+        if item is None or not sections:
+            return item
+        return project_item(item, sections)
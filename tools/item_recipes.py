@@ -0,0 +1,133 @@
+from collections import Counter
+from threading import Lock
+from typing import Dict, List
+
+from tools.hero_stats import parse_number
+from tools.item_db import ItemDB, normalize_name
+
+RECIPE = 'recipe'
+
+
+def parse_components(value: str) -> List[str]:
+    """
+    Parses the "Builds From" row rendered by `parse_recipe_block` e.g. "Ogre Axe + Mithril Hammer + Recipe"
+    :param value: the row value
+    :return: the normalized component names
+    """
+    return [normalize_name(component) for component in (value or '').split('+') if normalize_name(component)]
+
+
+class RecipeGraph:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        items = ItemDB().items
+        self.names = {key: item['name'] for key, item in items.items()}
+        self.costs = {key: parse_number(item['properties'].get('Cost')) for key, item in items.items()}
+        # item -> components edges of the DAG, the recipe scroll is kept as the pseudo component "recipe"
+        self.components = {
+            key: parse_components(item['properties'].get('Builds From'))
+            for key, item in items.items() if item['properties'].get('Builds From')
+        }
+        self.builds_into = {key: set() for key in items}
+        for key, components in self.components.items():
+            for component in components:
+                if component != RECIPE:
+                    self.builds_into.setdefault(component, set()).add(key)
+        for key, item in items.items():
+            for upgrade in (item['properties'].get('Upgrades Into') or '').split(','):
+                if normalize_name(upgrade):
+                    self.builds_into[key].add(normalize_name(upgrade))
+                    # the upgrades missing from the items data keep their scraped name
+                    self.names.setdefault(normalize_name(upgrade), upgrade.strip())
+
+        # memoized in one pass over the DAG so that every lookup afterwards is O(1)
+        self.recipe_costs = {}
+        self.total_costs = {}
+        self.base_components = {}
+        self.trees = {}
+        for key in items:
+            self.expand(key, ())
+
+        self._initialized = True
+
+    def expand(self, key: str, path: tuple) -> None:
+        """
+        Computes and memoizes the recipe cost, the total cost, the base components and the build tree
+        of an item after its components
+        :param key: the item key
+        :param path: the items being expanded, to break the cycles of inconsistent data
+        :return:
+        """
+        if key in self.trees:
+            return
+        components = [component for component in self.components.get(key, []) if component not in path]
+        for component in components:
+            if component != RECIPE:
+                self.expand(component, path + (key,))
+
+        item_components = [component for component in components if component != RECIPE]
+        components_cost = sum(self.total_costs.get(component, float('nan')) for component in item_components)
+        listed_cost = self.costs.get(key, float('nan'))
+        recipe_cost = 0.0
+        if RECIPE in components:
+            # the recipe price is the part of the listed cost that the components do not cover
+            recipe_cost = listed_cost - components_cost
+        total_cost = listed_cost if listed_cost == listed_cost else components_cost + recipe_cost
+
+        base_components = Counter()
+        for component in item_components:
+            base_components.update(self.base_components.get(component) or {component: 1})
+        if recipe_cost:
+            base_components[f"{RECIPE}_{key}"] += 1
+        if not base_components:
+            # a base item is its own only component
+            base_components[key] = 1
+
+        self.recipe_costs[key] = recipe_cost
+        self.total_costs[key] = total_cost
+        self.base_components[key] = base_components
+        self.trees[key] = {
+            'item': self.names.get(key, key),
+            'cost': self.cost_value(total_cost),
+            'components': [self.trees.get(component, {'item': component, 'cost': None})
+                           for component in item_components]
+            + ([{'item': 'Recipe', 'cost': self.cost_value(recipe_cost)}] if RECIPE in components else []),
+        }
+
+    @staticmethod
+    def cost_value(cost: float) -> int | None:
+        return None if cost != cost else int(round(cost))
+
+    def build_tree(self, key: str) -> Dict | None:
+        """
+        Retrieves the precomputed build information of an item
+        :param key: the item key e.g. "black_king_bar"
+        :return:
+        """
+        if key not in self.trees:
+            return None
+        return {
+            'item': self.names.get(key, key),
+            'total_cost': self.cost_value(self.total_costs[key]),
+            'recipe_cost': self.cost_value(self.recipe_costs[key]),
+            'tree': self.trees[key],
+            'base_components': {
+                ('Recipe (' + self.names.get(component[len(RECIPE) + 1:], component) + ')'
+                 if component.startswith(f"{RECIPE}_") else self.names.get(component, component)): count
+                for component, count in self.base_components[key].items()
+            },
+            'builds_into': sorted(self.names.get(upgrade, upgrade) for upgrade in self.builds_into.get(key, ())),
+        }
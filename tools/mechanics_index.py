@@ -0,0 +1,187 @@
+import os
+import re
+import glob
+import json
+import math
+import heapq
+from collections import Counter
+from threading import Lock
+from typing import Dict, List
+
+from constants import MECHANICS_DATA_PATH, MECHANICS_INDEX_PATH
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.item_db import split_markdown_blocks
+
+logger = ChatDota2Logger()
+
+INDEX_FORMAT_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_CHUNK_WORDS = 400
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'has', 'have',
+    'how', 'if', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'their', 'this', 'to', 'was',
+    'what', 'when', 'which', 'who', 'will', 'with', 'work', 'works'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and splits the text into terms, dropping the stopwords and the plural "s"
+    so that the same function can be used for the documents and the queries
+    :param text: the text to tokenize
+    :return:
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def chunk_mechanic(title: str, text: str) -> List[Dict]:
+    """
+    Splits a mechanic page into heading-level chunks, the headings are the `#` lines rendered
+    by `MechanicsScraper.convert_heading_to_md`. Long sections are split further on paragraphs
+    :param title: the title of the mechanic
+    :param text: the Markdown text of the mechanic page
+    :return:
+    """
+    chunks = []
+    headings = {}
+    for level, heading, lines in split_markdown_blocks(text):
+        # keep the path of the parent headings e.g. "Spell Block > Interactions"
+        headings = {lvl: hdg for lvl, hdg in headings.items() if lvl < level}
+        if heading:
+            headings[level] = heading
+        heading_path = ' > '.join(headings[lvl] for lvl in sorted(headings)) or title
+
+        paragraphs = [p.strip() for p in '\n'.join(lines).split('\n\n') if p.strip()]
+        current, current_words = [], 0
+        for paragraph in paragraphs:
+            words = len(paragraph.split())
+            if current and current_words + words > MAX_CHUNK_WORDS:
+                chunks.append({'mechanic': title, 'heading': heading_path, 'text': '\n\n'.join(current)})
+                current, current_words = [], 0
+            current.append(paragraph)
+            current_words += words
+        if current:
+            chunks.append({'mechanic': title, 'heading': heading_path, 'text': '\n\n'.join(current)})
+    return chunks
+
+
+def load_mechanics_chunks(path: str = MECHANICS_DATA_PATH) -> List[Dict]:
+    """
+    Loads and chunks all the mechanic pages written by `MechanicsScraper.scrape_mechanics`
+    :param path: the directory of the mechanic pages
+    :return:
+    """
+    chunks = []
+    for file in sorted(glob.glob(os.path.join(path, '*.md'))):
+        with open(file) as mechanic_file:
+            text = mechanic_file.read()
+        chunks.extend(chunk_mechanic(os.path.splitext(os.path.basename(file))[0], text))
+    return chunks
+
+
+def corpus_mtime(path: str = MECHANICS_DATA_PATH) -> float:
+    return max((os.path.getmtime(file) for file in glob.glob(os.path.join(path, '*.md'))), default=0.0)
+
+
+def build_mechanics_index(path: str = MECHANICS_DATA_PATH, index_path: str = MECHANICS_INDEX_PATH) -> Dict:
+    """
+    Builds the BM25 inverted index over the heading-level chunks of the mechanic pages and persists
+    it on disk. The BM25 weight of every (term, chunk) pair is precomputed so that a query is only a
+    sum of posting weights
+    :param path: the directory of the mechanic pages
+    :param index_path: the path to persist the index to
+    :return:
+    """
+    chunks = load_mechanics_chunks(path)
+    term_frequencies = []
+    for chunk in chunks:
+        # the mechanic title and the headings are part of the indexed text
+        term_frequencies.append(Counter(tokenize(f"{chunk['heading']} {chunk['text']}")))
+
+    doc_lengths = [sum(tf.values()) for tf in term_frequencies]
+    avg_doc_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+    avg_doc_length = avg_doc_length or 1.0
+    document_frequencies = Counter(term for tf in term_frequencies for term in tf)
+
+    postings = {}
+    num_chunks = len(chunks)
+    for chunk_id, (tf, doc_length) in enumerate(zip(term_frequencies, doc_lengths)):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_doc_length)
+        for term, freq in tf.items():
+            df = document_frequencies[term]
+            idf = math.log(1 + (num_chunks - df + 0.5) / (df + 0.5))
+            weight = idf * freq * (BM25_K1 + 1) / (freq + norm)
+            postings.setdefault(term, []).append([chunk_id, round(weight, 4)])
+
+    index = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'corpus_mtime': corpus_mtime(path),
+        'chunks': chunks,
+        'postings': postings,
+    }
+    with open(index_path, 'w') as index_file:
+        json.dump(index, index_file, ensure_ascii=False)
+    logger.info("Built the mechanics index with %s chunks and %s terms", num_chunks, len(postings))
+    return index
+
+
+class MechanicsIndex:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        index = None
+        if os.path.exists(MECHANICS_INDEX_PATH):
+            with open(MECHANICS_INDEX_PATH) as index_file:
+                index = json.load(index_file)
+            # rebuild the index if it is outdated with respect to the scraped pages
+            if (index.get('format_version') != INDEX_FORMAT_VERSION or
+                    index.get('corpus_mtime', 0.0) < corpus_mtime()):
+                index = None
+        if index is None:
+            index = build_mechanics_index()
+
+        self.chunks = index['chunks']
+        self.postings = {term: [tuple(posting) for posting in postings]
+                         for term, postings in index['postings'].items()}
+
+        self._initialized = True
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        Retrieves the top-k chunks for the query
+        :param query: the free text query e.g. "does spell block stop silence"
+        :param k: the number of chunks to return
+        :return:
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            for chunk_id, weight in self.postings.get(term, ()):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight
+
+        top_chunks = heapq.nlargest(k, scores.items(), key=lambda score: score[1])
+        return [dict(self.chunks[chunk_id], score=round(score, 3)) for chunk_id, score in top_chunks]
+
+
+if __name__ == '__main__':
+    build_mechanics_index()
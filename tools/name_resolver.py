@@ -0,0 +1,255 @@
+import re
+from collections import Counter
+from threading import Lock
+from typing import Dict, List, Tuple, get_args
+
+from constants import HEROES, HERO_ALIASES
+from tools.hero_db import HeroDB
+from tools.item_db import ItemDB, normalize_name
+
+# the minimum Dice coefficient of the trigrams for a fuzzy match to be accepted
+FUZZY_THRESHOLD = 0.5
+MAX_FUZZY_CACHE_SIZE = 10_000
+WORD_PATTERN = re.compile(r"[a-z0-9'-]+")
+# the longest names e.g. "keeper of the light" or "aghanims blessing roshan"
+MAX_MENTION_WORDS = 4
+
+
+def compact_name(name: str) -> str:
+    """
+    Normalizes a name and drops the separators so that "Anti-Mage", "anti mage" and "antimage"
+    share the same key
+    :param name: the name to normalize
+    :return:
+    """
+    return normalize_name(name).replace('_', '')
+
+
+def mention_words(text: str) -> List[str]:
+    """
+    Splits a text into the lowercase words the mentions are matched on, the possessives are dropped
+    e.g. "axe's ultimate" -> ["axe", "ultimate"]
+    :param text: the text
+    :return:
+    """
+    return [word[:-2] if word.endswith("'s") else word for word in WORD_PATTERN.findall(text.lower())]
+
+
+def acronym(name: str) -> str:
+    return ''.join(word[0] for word in normalize_name(name).split('_') if word)
+
+
+def hero_keys(heroes: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    Maps the hero names of the `HEROES` literal and of the hero data to the key the hero data stores them under,
+    the scraper keys e.g. "anti-mage" or "nature's_prophet" differ from the literal ones e.g. "anti_mage".
+    The heroes missing from the hero data keep their literal name
+    :param heroes: the hero data by hero key
+    :return:
+    """
+    data_keys = {compact_name(hero_name): hero_name for hero_name in heroes}
+    keys = {hero_name: hero_name for hero_name in heroes}
+    for hero_name in get_args(HEROES):
+        keys.setdefault(hero_name, data_keys.get(compact_name(hero_name), hero_name))
+    return keys
+
+
+def trigrams(key: str) -> Counter:
+    padded = f"  {key} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class EntityNames:
+    """ The exact alias map and the trigram index of one kind of entity (heroes, abilities or items) """
+
+    def __init__(self):
+        self.aliases: Dict[str, str] = {}
+        self.keys: List[str] = []
+        self.key_trigrams: List[Counter] = []
+        self.trigram_postings: Dict[str, List[int]] = {}
+        self.cache: Dict[str, str | None] = {}
+
+    def add(self, alias: str, canonical: str, override: bool = False) -> None:
+        key = compact_name(alias)
+        if not key or (key in self.aliases and not override):
+            return
+        if key not in self.aliases:
+            key_id = len(self.keys)
+            self.keys.append(key)
+            self.key_trigrams.append(trigrams(key))
+            for trigram in self.key_trigrams[key_id]:
+                self.trigram_postings.setdefault(trigram, []).append(key_id)
+        self.aliases[key] = canonical
+        # the mentions are matched without their possessives e.g. "berserker call" for "Berserker's Call"
+        mention_key = compact_name(' '.join(mention_words(alias)))
+        if mention_key != key:
+            self.add(' '.join(mention_words(alias)), canonical, override)
+
+    def add_acronyms(self, names: Dict[str, str], min_words: int) -> None:
+        """
+        Adds the acronyms of the names e.g. "od" or "bkb", only when no other name or alias already claims them
+        :param names: the mapping of the names to their canonical form
+        :param min_words: the minimum number of words for a name to get an acronym
+        :return:
+        """
+        eligible = {(acronym(name), canonical) for name, canonical in names.items()
+                    if len(normalize_name(name).split('_')) >= min_words}
+        # the spellings of the same entity share their acronym
+        counts = Counter(name_acronym for name_acronym, _ in eligible)
+        for name_acronym, canonical in eligible:
+            if counts[name_acronym] == 1:
+                self.add(name_acronym, canonical)
+
+    def candidates(self, name: str, limit: int) -> List[Tuple[str, float]]:
+        """
+        Ranks the aliases sharing trigrams with the name by their Dice coefficient
+        :param name: the (misspelled) name
+        :param limit: the number of candidates to return
+        :return:
+        """
+        query_trigrams = trigrams(compact_name(name))
+        overlaps = Counter()
+        for trigram, count in query_trigrams.items():
+            for key_id in self.trigram_postings.get(trigram, ()):
+                overlaps[key_id] += min(count, self.key_trigrams[key_id][trigram])
+
+        query_size = sum(query_trigrams.values())
+        scored = {}
+        for key_id, overlap in overlaps.items():
+            score = 2 * overlap / (query_size + sum(self.key_trigrams[key_id].values()))
+            canonical = self.aliases[self.keys[key_id]]
+            scored[canonical] = max(score, scored.get(canonical, 0.0))
+        return sorted(scored.items(), key=lambda candidate: candidate[1], reverse=True)[:limit]
+
+    def resolve(self, name: str) -> str | None:
+        key = compact_name(name)
+        if key in self.aliases:
+            return self.aliases[key]
+        if key not in self.cache:
+            if len(self.cache) >= MAX_FUZZY_CACHE_SIZE:
+                self.cache.clear()
+            best = self.candidates(name, limit=1)
+            self.cache[key] = best[0][0] if best and best[0][1] >= FUZZY_THRESHOLD else None
+        return self.cache[key]
+
+
+class NameResolver:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self.build()
+        # rebuild the names when the hero data is hot-reloaded
+        HeroDB().subscribe(lambda changed_heroes: self.build())
+        self._initialized = True
+
+    def build(self) -> None:
+        """
+        Builds the alias maps and the trigram indices of the heroes, abilities and items
+        :return:
+        """
+        heroes = EntityNames()
+        # the names resolve to the keys of the hero data, the keys come first so that they win over the literal names
+        keys = hero_keys(HeroDB().heroes)
+        for hero_name, aliases in HERO_ALIASES.items():
+            for alias in aliases:
+                heroes.add(alias, keys.get(hero_name, hero_name), override=True)
+        for hero_name, key in keys.items():
+            heroes.add(hero_name, key)
+        heroes.add_acronyms(keys, min_words=2)
+
+        abilities = EntityNames()
+        ability_heroes: Dict[str, List[Tuple[str, str]]] = {}
+        for hero_name, hero in HeroDB().heroes.items():
+            for ability in list(hero.get('abilities') or []) + [hero.get('innate') or {}]:
+                if ability.get('name'):
+                    abilities.add(ability['name'], ability['name'])
+                    ability_heroes.setdefault(ability['name'], []).append((hero_name, ability['name']))
+
+        items = EntityNames()
+        for key, item in ItemDB().items.items():
+            items.add(item['name'], key)
+        items.add_acronyms({item['name']: key for key, item in ItemDB().items.items()}, min_words=3)
+
+        self.ability_heroes = ability_heroes
+        self.names = {'heroes': heroes, 'abilities': abilities, 'items': items}
+
+    def resolve_hero(self, name: str) -> str | None:
+        """
+        Resolves a hero name, alias, acronym or misspelling to the hero key e.g. "OD" -> "outworld_destroyer"
+        :param name: the name given by the user or the model
+        :return:
+        """
+        return self.names['heroes'].resolve(name)
+
+    def resolve_item(self, name: str) -> str | None:
+        return self.names['items'].resolve(name)
+
+    def resolve_ability(self, name: str) -> List[Tuple[str, str]]:
+        """
+        Resolves an ability name to the (hero, ability) pairs that have it
+        :param name: the name of the ability
+        :return:
+        """
+        ability_name = self.names['abilities'].resolve(name)
+        return self.ability_heroes.get(ability_name, []) if ability_name else []
+
+    def scan_mentions(self, text: str, kind: str) -> List[Tuple[int, int, str | None]]:
+        """
+        Splits a text into words and matches the exact names and aliases of an entity kind, the longest match wins
+        :param text: the text e.g. the user message
+        :param kind: heroes, abilities or items
+        :return: the (start word, word count, canonical name or None) spans covering all the words
+        """
+        aliases = self.names[kind].aliases
+        words = mention_words(text)
+        spans = []
+        i = 0
+        while i < len(words):
+            for length in range(min(MAX_MENTION_WORDS, len(words) - i), 0, -1):
+                canonical = aliases.get(compact_name(' '.join(words[i:i + length])))
+                if canonical:
+                    spans.append((i, length, canonical))
+                    i += length
+                    break
+            else:
+                spans.append((i, 1, None))
+                i += 1
+        return spans
+
+    def find_mentions(self, text: str, kind: str = 'heroes') -> List[str]:
+        """
+        Finds the exact names and aliases of an entity kind mentioned in a text
+        :param text: the text e.g. the user message
+        :param kind: heroes, abilities or items
+        :return: the canonical names in order of appearance
+        """
+        return list(dict.fromkeys(canonical for _, _, canonical in self.scan_mentions(text, kind) if canonical))
+
+    def canonicalize(self, text: str, kind: str = 'heroes') -> str:
+        """
+        Rewrites the names and aliases of an entity kind in a text to their canonical form e.g.
+        "am talents" -> "anti-mage talents"
+        :param text: the text
+        :param kind: heroes, abilities or items
+        :return: the lowercase rewritten text
+        """
+        words = mention_words(text)
+        return ' '.join(
+            canonical or ' '.join(words[start:start + length])
+            for start, length, canonical in self.scan_mentions(text, kind)
+        )
+
+    def suggest(self, name: str, kind: str = 'heroes', limit: int = 5) -> List[str]:
+        return [canonical for canonical, _ in self.names[kind].candidates(name, limit)]
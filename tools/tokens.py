@@ -0,0 +1,52 @@
+from functools import lru_cache
+from typing import Dict
+
+import tiktoken
+from langchain_core.messages import BaseMessage
+
+from constants import LLM_MODEL
+from custom_logger.custom_logger import ChatDota2Logger
+
+logger = ChatDota2Logger()
+
+CHARS_PER_TOKEN = 4
+# the per message overhead of the chat format
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# the token counts computed at load time e.g. of the hero renderings, by source
+known_token_counts: Dict[str, Dict[str, int]] = {}
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = LLM_MODEL):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as err:
+        # the encodings are downloaded on their first use
+        logger.warning("Could not load the tiktoken encoding of %s, estimating the token counts: %s", model, err)
+        return None
+
+
+def register_token_counts(source: str, counts: Dict[str, int]) -> None:
+    """
+    Publishes the token counts of texts known in advance, replacing the earlier counts of the source
+    :param source: the owner of the texts e.g. heroes
+    :param counts: the token count of each text
+    :return:
+    """
+    known_token_counts[source] = counts
+
+
+def count_tokens(text: str) -> int:
+    for counts in known_token_counts.values():
+        if text in counts:
+            return counts[text]
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_TOKEN_OVERHEAD
@@ -1,8 +1,133 @@
+from typing import Annotated, List, Optional
+
 from pydantic import Field
 
-from tools.hero_db import HeroDB
-from constants import HEROES
+from tools.ability_index import AbilityIndex
+from tools.entity_linker import MechanicsLinker
+from tools.hero_renderer import HeroRenderer
+from tools.hero_stats import HeroStats
+from tools.hero_table import HeroRanking
+from tools.item_db import ItemDB
+from tools.item_recipes import RecipeGraph
+from tools.mechanics_index import MechanicsIndex
+from tools.name_resolver import NameResolver
+from tools.vector_index import VectorIndex
+from constants import HERO_STATS, ITEM_SECTIONS, VECTOR_SOURCES
+
+ENTITY_LABELS = {'heroes': 'hero', 'items': 'item', 'abilities': 'ability'}
+
+
+def unknown_entity(name: str, kind: str = 'heroes') -> dict:
+    return {'error': f"Unknown {ENTITY_LABELS[kind]} '{name}'", 'suggestions': NameResolver().suggest(name, kind)}
+
+
+def get_hero(
+    hero_name: Annotated[str, Field(description="The name of the hero, aliases and acronyms are accepted e.g. Anti-Mage, am")]
+):
+    """Retrieves the roles, basic stats, abilities, innate, facets, Aghanim's upgrades and talents of a hero."""
+    hero_renderer = HeroRenderer()
+    # the names are resolved against the hero registry here instead of being enumerated in the tool schema
+    hero_key = NameResolver().resolve_hero(hero_name)
+    # the compact rendering, with the definitions of the linked mechanics, is precomputed at load time
+    rendered_hero = hero_renderer.get(hero_key) if hero_key else None
+    return rendered_hero.text if rendered_hero else unknown_entity(hero_name)
+
+
+def get_item(
+    item_name: Annotated[str, Field(description="The name of the item e.g. Black King Bar")],
+    sections: Annotated[
+        Optional[List[ITEM_SECTIONS]],
+        Field(description="The sections of the item to retrieve, all of them if not given")
+    ] = None
+):
+    """Retrieves the information of a shop item, neutral item or enchantment."""
+    item_db = ItemDB()
+    item_key = NameResolver().resolve_item(item_name)
+    item = item_db.get(item_key, sections) if item_key else None
+    if item is None:
+        return unknown_entity(item_name, 'items')
+    if sections and not {'active', 'passive'} & set(sections):
+        return item
+    return {**item, 'mechanics_definitions': MechanicsLinker().get_definitions(item_db.items[item_key]['mechanics'])}
+
+
+def search_mechanics(
+    query: Annotated[str, Field(description="The question or keywords about a game mechanic e.g. spell block silence")],
+    k: Annotated[int, Field(description="The number of passages to retrieve")] = 5
+):
+    """Searches the DOTA 2 game mechanics pages and retrieves the most relevant passages."""
+    mechanics_index = MechanicsIndex()
+    return mechanics_index.search(query, k)
+
+
+def semantic_search(
+    query: Annotated[str, Field(description="The question in natural language e.g. which heroes can dispel stuns")],
+    k: Annotated[int, Field(description="The number of passages to retrieve")] = 5,
+    sources: Annotated[
+        Optional[List[VECTOR_SOURCES]],
+        Field(description="The sources to search in, all of them if not given")
+    ] = None
+):
+    """Searches semantically across the hero abilities, the items and the game mechanics when the exact name is not known."""
+    vector_index = VectorIndex()
+    return vector_index.search(query, k, sources)
+
+
+def get_hero_stats_at_level(
+    hero_name: Annotated[str, Field(description="The name of the hero")],
+    levels: Annotated[
+        Optional[List[int]],
+        Field(description="The hero levels between 1 and 30, all of them if not given")
+    ] = None,
+    stats: Annotated[
+        Optional[List[HERO_STATS]],
+        Field(description="The stats to retrieve, all of them if not given")
+    ] = None
+):
+    """Retrieves the computed attributes, health, mana, regeneration, armor, average damage and attack speed of a hero at the given levels, without items and talents."""
+    hero_stats = HeroStats()
+    hero_key = NameResolver().resolve_hero(hero_name)
+    return hero_stats.get(hero_key, levels, stats) if hero_key else unknown_entity(hero_name)
+
+
+def rank_heroes(
+    filter: Annotated[
+        str,
+        Field(description="The conditions joined by `and`, each one `<column> <operator> <value>` with the operators "
+                          "==, !=, >, >=, <, <= or `roles has <role>` e.g. `main_attribute == agility and "
+                          "attack_type == melee and day_movement_speed > 300`. Empty to keep all the heroes")
+    ] = '',
+    sort_by: Annotated[
+        Optional[str],
+        Field(description="The numeric column to rank by e.g. base_armor, base_health, day_movement_speed, "
+                          "base_strength, strength_gain, attack_range")
+    ] = None,
+    k: Annotated[int, Field(description="The number of heroes to return")] = 10,
+    descending: Annotated[bool, Field(description="Whether to rank from the highest value")] = True
+):
+    """Filters and ranks all the heroes by their base stats, main attribute (strength, agility, intelligence, universal), attack type (melee, ranged) and roles in one call."""
+    hero_ranking = HeroRanking()
+    return hero_ranking.rank(filter, sort_by, k, descending)
+
+
+def find_abilities(
+    properties: Annotated[
+        List[str],
+        Field(description="The properties the abilities must all have, either an effect keyword (stun, silence, root, "
+                          "slow, disarm, hex, dispel, break, heal, shield, teleport, illusion, summon, "
+                          "pierces_debuff_immunity...) or a `label:value` pair of the ability e.g. "
+                          "damage_type:magical, ability:unit_target, affects:allies")
+    ]
+):
+    """Finds the abilities of all the heroes having all the given properties in one lookup."""
+    ability_index = AbilityIndex()
+    return ability_index.find(properties)
+
 
-def get_hero(hero_name: HEROES = Field(description="The name of the hero")):
-    hero_db = HeroDB()
-    return hero_db.heroes.get(hero_name)
\ No newline at end of file
+def item_build_tree(
+    item_name: Annotated[str, Field(description="The name of the item e.g. Black King Bar")]
+):
+    """Retrieves the build tree of an item with the cost of each component and recipe, its total cost, all the base components it needs and the items it builds into."""
+    recipe_graph = RecipeGraph()
+    item_key = NameResolver().resolve_item(item_name)
+    return recipe_graph.build_tree(item_key) if item_key else unknown_entity(item_name, 'items')
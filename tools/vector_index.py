@@ -0,0 +1,266 @@
+import zlib
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from constants import VECTOR_ENCODER
+from custom_logger.custom_logger import ChatDota2Logger
+from tools.hero_db import HeroDB
+from tools.item_db import ItemDB
+from tools.mechanics_index import load_mechanics_chunks, tokenize
+
+logger = ChatDota2Logger()
+
+# the coarse quantizer only pays off once a brute force scan stops fitting in a few milliseconds
+IVF_MIN_CHUNKS = 50_000
+IVF_NPROBE = 8
+KMEANS_ITERATIONS = 10
+
+
+class Encoder(ABC):
+    """ The interface of the encoders that turn texts into L2-normalized float32 vectors """
+    name: str
+    dim: int
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        pass
+
+
+class HashingEncoder(Encoder):
+    """
+    A deterministic local encoder hashing the terms and term bigrams of the text into a fixed
+    number of dimensions, needs no network access and gives the same vectors across processes
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.name = f"hashing-{dim}"
+        self.dim = dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            features = terms + [f"{first} {second}" for first, second in zip(terms, terms[1:])]
+            for feature in features:
+                # crc32 rather than hash() so that the vectors do not depend on PYTHONHASHSEED
+                hashed = zlib.crc32(feature.encode())
+                sign = 1.0 if hashed & 1 else -1.0
+                vectors[row, (hashed >> 1) % self.dim] += sign
+        # sublinear term frequency so that a repeated term does not dominate the vector
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return normalize_rows(vectors)
+
+
+class OpenAIEncoder(Encoder):
+    """ Encodes the texts with the OpenAI embeddings API """
+
+    def __init__(self, model: str = 'text-embedding-3-small', batch_size: int = 256):
+        from langchain_openai import OpenAIEmbeddings
+
+        self.name = f"openai-{model}"
+        self.embeddings = OpenAIEmbeddings(model=model)
+        self.batch_size = batch_size
+        self.dim = None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + self.batch_size]))
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.dim = vectors.shape[1] if vectors.size else self.dim
+        return normalize_rows(vectors)
+
+
+ENCODERS = {
+    'hashing': HashingEncoder,
+    'openai': OpenAIEncoder,
+}
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+
+def collect_hero_chunks() -> List[Dict]:
+    chunks = []
+    for hero_name, hero in HeroDB().heroes.items():
+        abilities = list(hero.get('abilities') or [])
+        if hero.get('innate'):
+            abilities.append(hero['innate'])
+        for ability in abilities:
+            text = ' '.join(
+                [ability.get('name', ''), ability.get('description', '')]
+                + [f"{key} {value}" for key, value in (ability.get('metadata') or {}).items()]
+                + list((ability.get('traits') or {}).keys())
+                + list(ability.get('extra_descriptions') or [])
+            )
+            chunks.append({'source': 'heroes', 'name': hero_name, 'section': ability.get('name', ''), 'text': text})
+        for facet_name, facet in (hero.get('facets') or {}).items():
+            chunks.append({
+                'source': 'heroes', 'name': hero_name, 'section': facet_name,
+                'text': f"{facet_name} {facet.get('description', '')}"
+            })
+    return chunks
+
+
+def collect_item_chunks() -> List[Dict]:
+    chunks = []
+    for item in ItemDB().items.values():
+        properties = ' '.join(f"{label} {value}" for label, value in item['properties'].items())
+        chunks.append({
+            'source': 'items', 'name': item['name'], 'section': 'properties',
+            'text': f"{item['name']} {item['flavor']} {properties}"
+        })
+        for ability in item['abilities']:
+            chunks.append({
+                'source': 'items', 'name': item['name'], 'section': ability['name'],
+                'text': f"{item['name']} {ability['name']} {ability['description']} {' '.join(ability['notes'])}"
+            })
+    return chunks
+
+
+def collect_mechanics_chunks() -> List[Dict]:
+    return [
+        {'source': 'mechanics', 'name': chunk['mechanic'], 'section': chunk['heading'],
+         'text': f"{chunk['heading']} {chunk['text']}"}
+        for chunk in load_mechanics_chunks()
+    ]
+
+
+def train_coarse_quantizer(matrix: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Trains a spherical k-means coarse quantizer (IVF) so that a query only scans the vectors of
+    the `IVF_NPROBE` closest lists instead of the whole matrix
+    :param matrix: the normalized vectors of the chunks
+    :return: the centroids and the ids of the vectors of each list
+    """
+    num_lists = int(np.sqrt(len(matrix)))
+    rng = np.random.default_rng(0)
+    # train on a sample like faiss does, the assignment of all the vectors happens once at the end
+    sample = matrix[rng.choice(len(matrix), min(len(matrix), 64 * num_lists), replace=False)]
+    centroids = sample[rng.choice(len(sample), num_lists, replace=False)]
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind='stable')
+        lists, starts = np.unique(assignments[order], return_index=True)
+        sums = centroids.copy()  # the empty lists keep their previous centroid
+        sums[lists] = np.add.reduceat(sample[order], starts, axis=0)
+        centroids = normalize_rows(sums)
+
+    assignments = np.argmax(matrix @ centroids.T, axis=1)
+    return centroids, [np.flatnonzero(assignments == i) for i in range(num_lists)]
+
+
+class IndexData(NamedTuple):
+    chunks: List[Dict]
+    sources: np.ndarray
+    matrix: np.ndarray
+    # the coarse quantizer, None below `IVF_MIN_CHUNKS` chunks
+    centroids: np.ndarray | None
+    inverted_lists: List[np.ndarray] | None
+
+
+def build_index_data(chunks: List[Dict], matrix: np.ndarray) -> IndexData:
+    centroids, inverted_lists = train_coarse_quantizer(matrix) if len(chunks) >= IVF_MIN_CHUNKS else (None, None)
+    return IndexData(chunks, np.array([chunk['source'] for chunk in chunks]), matrix, centroids, inverted_lists)
+
+
+class VectorIndex:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, encoder: Encoder = None):
+        # Prevent reinitialization on subsequent calls
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+        # the first calls of concurrent sessions wait for a single build instead of each encoding the chunks
+        with self._lock:
+            if hasattr(self, "_initialized") and self._initialized:
+                return
+
+            self.encoder = encoder or ENCODERS[VECTOR_ENCODER]()
+            # the items and the mechanics are not hot-reloaded, their vectors are encoded once
+            self.static_chunks = collect_item_chunks() + collect_mechanics_chunks()
+            self.static_matrix = self.encoder.encode([chunk['text'] for chunk in self.static_chunks])
+            self.index = self.build()
+            # re-encode the hero chunks when the hero data is hot-reloaded
+            HeroDB().subscribe(lambda changed_heroes: self.rebuild())
+            self._initialized = True
+
+    def build(self) -> IndexData:
+        hero_chunks = collect_hero_chunks()
+        hero_matrix = self.encoder.encode([chunk['text'] for chunk in hero_chunks])
+        index = build_index_data(hero_chunks + self.static_chunks, np.concatenate([hero_matrix, self.static_matrix]))
+        logger.info("Built the vector index with %s chunks using the %s encoder", len(index.chunks), self.encoder.name)
+        return index
+
+    def rebuild(self) -> None:
+        # the searches keep using the previous index until the new one is swapped in
+        self.index = self.build()
+
+    @staticmethod
+    def candidates(index: IndexData, query_vector: np.ndarray, k: int) -> np.ndarray:
+        """
+        Retrieves the ids of the vectors in the `IVF_NPROBE` lists closest to the query, probing
+        further lists if they hold less than k vectors in total
+        :param index: the index data searched
+        :param query_vector: the normalized query vector
+        :param k: the minimum number of candidates
+        :return:
+        """
+        ids, num_candidates = [], 0
+        for i in np.argsort(-(index.centroids @ query_vector)):
+            ids.append(index.inverted_lists[i])
+            num_candidates += len(index.inverted_lists[i])
+            if len(ids) >= IVF_NPROBE and num_candidates >= k:
+                break
+        return np.concatenate(ids)
+
+    def search_batch(self, queries: List[str], k: int = 5, sources: List[str] | None = None) -> List[List[Dict]]:
+        """
+        Retrieves the top-k chunks for each query with a single matrix product for the whole batch
+        :param queries: the free text queries
+        :param k: the number of chunks to return per query
+        :param sources: restricts the results to the given sources e.g. ['heroes', 'items']
+        :return:
+        """
+        # one consistent snapshot even if the index is swapped by a reload meanwhile
+        index = self.index
+        query_vectors = self.encoder.encode(queries)
+        if index.centroids is None:
+            scores = query_vectors @ index.matrix.T
+        else:
+            scores = np.full((len(queries), len(index.chunks)), -np.inf, dtype=np.float32)
+            for row, query_vector in enumerate(query_vectors):
+                ids = self.candidates(index, query_vector, k)
+                scores[row, ids] = index.matrix[ids] @ query_vector
+        if sources:
+            scores[:, ~np.isin(index.sources, sources)] = -np.inf
+
+        k = min(k, len(index.chunks))
+        results = []
+        for row in scores:
+            if k == 0:
+                results.append([])
+                continue
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([
+                dict(index.chunks[i], score=round(float(row[i]), 3)) for i in top if row[i] > 0
+            ])
+        return results
+
+    def search(self, query: str, k: int = 5, sources: List[str] | None = None) -> List[Dict]:
+        return self.search_batch([query], k, sources)[0]